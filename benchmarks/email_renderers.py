@@ -0,0 +1,71 @@
+"""
+Compare the email template renderers.
+
+    python benchmarks/email_renderers.py [iterations]
+
+Renders the activation subject and body, like `UserStatus.send` does.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.template.loader import render_to_string  # noqa: E402
+
+from graphql_auth import renderers  # noqa: E402
+
+SUBJECT = "email/activation_subject.txt"
+TEMPLATE = "email/activation_email.html"
+
+CONTEXT = {
+    "user": get_user_model()(username="foo"),
+    "token": "eyJ1c2VybmFtZSI6ImZvbyIsImFjdGlvbiI6ImFjdGl2YXRpb24ifQ:1jUO6P:abc",
+    "protocol": "https",
+    "port": "443",
+    "domain": "example.com",
+    "site_name": "example.com",
+    "path": "activate",
+}
+
+
+def render_to_string_baseline():
+    render_to_string(SUBJECT, CONTEXT)
+    render_to_string(TEMPLATE, CONTEXT)
+
+
+def bench(name, func, iterations):
+    func()  # warm up, compiles the templates
+    seconds = timeit.timeit(func, number=iterations)
+    print("%-24s %8.2f us/email" % (name, seconds / iterations * 1e6))
+
+
+def main(iterations):
+    bench("render_to_string", render_to_string_baseline, iterations)
+    for cls in (
+        renderers.DjangoTemplateRenderer,
+        renderers.Jinja2Renderer,
+        renderers.SimpleRenderer,
+    ):
+        try:
+            renderer = cls()
+        except django.core.exceptions.ImproperlyConfigured as e:
+            print("%-24s skipped: %s" % (cls.__name__, e))
+            continue
+
+        def render(renderer=renderer):
+            renderer.render(SUBJECT, CONTEXT)
+            renderer.render(TEMPLATE, CONTEXT)
+
+        bench(cls.__name__, render, iterations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,56 @@
+"""
+Compare the token creation and verification.
+
+    python benchmarks/tokens.py [iterations]
+
+`django.core.signing` builds a signer and derives the HMAC key on every
+call, `graphql_auth.tokens` signers are built once per action.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core import signing  # noqa: E402
+
+from graphql_auth import tokens  # noqa: E402
+from graphql_auth.constants import TokenAction  # noqa: E402
+
+ACTION = TokenAction.PASSWORD_RESET
+PAYLOAD = {"username": "foo", "action": ACTION}
+
+
+def signing_round_trip():
+    signing.loads(signing.dumps(PAYLOAD), max_age=3600)
+
+
+def signer_round_trip():
+    signer = tokens.get_signer(ACTION)
+    signer.loads(signer.dumps(PAYLOAD), max_age=3600)
+
+
+def compact_round_trip():
+    tokens.loads(tokens.dumps(42, ACTION), max_age=3600)
+
+
+def bench(name, func, iterations):
+    func()  # warm up, builds the signers
+    seconds = timeit.timeit(func, number=iterations)
+    print("%-24s %8.2f us/token" % (name, seconds / iterations * 1e6))
+
+
+def main(iterations):
+    bench("signing.dumps/loads", signing_round_trip, iterations)
+    bench("get_signer(action)", signer_round_trip, iterations)
+    bench("compact", compact_round_trip, iterations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,33 @@
+"""
+Models that can be imported from a custom user model module.
+
+Unlike `graphql_auth.models`, nothing here needs the user model.
+"""
+from django.db import models
+
+
+class AbstractUserStatusMixin(models.Model):
+    """
+    Keep the account status on the user row, instead of on `UserStatus`.
+
+    Reading `verified` or `archived` for a logged in user, a login or
+    a user query then takes no extra query or join.
+
+        class CustomUser(AbstractUserStatusMixin, AbstractUser):
+            pass
+
+    `user.status` still works, it reads and saves these fields.
+    """
+
+    verified = models.BooleanField(default=False)
+    archived = models.BooleanField(default=False)
+    secondary_email = models.EmailField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def status(self):
+        from .models import InlineUserStatus
+
+        return InlineUserStatus(self)
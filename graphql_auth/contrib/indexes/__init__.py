@@ -0,0 +1,9 @@
+"""
+Optional indexes on the columns graphql_auth filters on.
+
+Add `graphql_auth.contrib.indexes` to `INSTALLED_APPS` and migrate.
+On PostgreSQL the indexes are built with `CREATE INDEX CONCURRENTLY`,
+so large user tables stay writable meanwhile.
+"""
+
+default_app_config = "graphql_auth.contrib.indexes.apps.GraphQLAuthIndexesConfig"
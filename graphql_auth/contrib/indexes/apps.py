@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class GraphQLAuthIndexesConfig(AppConfig):
+    name = "graphql_auth.contrib.indexes"
+    label = "graphql_auth_indexes"
+    verbose_name = "GraphQL Auth indexes"
@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from graphql_auth.contrib.indexes.operations import (
+    MISSING,
+    INVALID,
+    get_index_state,
+    get_indexes,
+)
+
+
+class Command(BaseCommand):
+    help = "Report which of the optional graphql_auth indexes are present."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to inspect, defaults to the 'default' database.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        missing = 0
+        for name, (model, index) in sorted(get_indexes(apps).items()):
+            state = get_index_state(connection, model, index)
+            if state in (MISSING, INVALID):
+                missing += 1
+            self.stdout.write(
+                "%s on %s (%s): %s"
+                % (name, model._meta.db_table, ", ".join(index.fields), state)
+            )
+        if missing:
+            self.stdout.write(
+                "%s indexes are missing or invalid, "
+                "run migrate graphql_auth_indexes to build them." % missing
+            )
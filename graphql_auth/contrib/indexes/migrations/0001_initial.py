@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import migrations
+
+from graphql_auth.contrib.indexes.operations import (
+    SECONDARY_EMAIL_INDEX,
+    STATUS_FLAGS_INDEX,
+    USER_EMAIL_INDEX,
+    AddIndexOnline,
+)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run in a transaction. Every
+    # operation skips an index that exists, so an interrupted
+    # migration can be run again.
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("graphql_auth", "0004_emailaddress"),
+    ]
+
+    operations = [
+        AddIndexOnline(USER_EMAIL_INDEX),
+        AddIndexOnline(SECONDARY_EMAIL_INDEX),
+        AddIndexOnline(STATUS_FLAGS_INDEX),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from graphql_auth.contrib.indexes.operations import (
+    ARCHIVED_INDEX,
+    INACTIVE_INDEX,
+    UNVERIFIED_INDEX,
+    AddIndexOnline,
+)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [("graphql_auth_indexes", "0001_initial")]
+
+    operations = [
+        AddIndexOnline(UNVERIFIED_INDEX),
+        AddIndexOnline(ARCHIVED_INDEX),
+        AddIndexOnline(INACTIVE_INDEX),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+from graphql_auth.contrib.indexes.operations import (
+    SECONDARY_EMAIL_LOWER_INDEX,
+    USER_EMAIL_LOWER_INDEX,
+    AddIndexOnline,
+)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [("graphql_auth_indexes", "0002_partial_indexes")]
+
+    operations = [
+        AddIndexOnline(USER_EMAIL_LOWER_INDEX),
+        AddIndexOnline(SECONDARY_EMAIL_LOWER_INDEX),
+    ]
@@ -0,0 +1,252 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import NotSupportedError
+from django.db.migrations.operations.base import Operation
+from django.db.models import Index, Q
+
+from graphql_auth.abstract_models import AbstractUserStatusMixin
+
+USER_EMAIL_INDEX = "graphql_auth_user_email"
+SECONDARY_EMAIL_INDEX = "graphql_auth_secondary_email"
+STATUS_FLAGS_INDEX = "graphql_auth_status_flags"
+UNVERIFIED_INDEX = "graphql_auth_status_unverified"
+ARCHIVED_INDEX = "graphql_auth_status_archived"
+INACTIVE_INDEX = "graphql_auth_user_inactive"
+USER_EMAIL_LOWER_INDEX = "graphql_auth_user_email_lower"
+SECONDARY_EMAIL_LOWER_INDEX = "graphql_auth_secondary_email_lower"
+
+PRESENT = "present"
+MISSING = "missing"
+# left by an interrupted CREATE INDEX CONCURRENTLY, not used by queries
+INVALID = "invalid"
+# partial index, on a database without them
+UNSUPPORTED = "unsupported"
+
+
+def supports_expression_indexes(connection):
+    if connection.vendor == "mysql":
+        return not connection.mysql_is_mariadb and connection.mysql_version >= (
+            8,
+            0,
+            13,
+        )
+    return connection.vendor in ("postgresql", "sqlite", "oracle")
+
+
+class LowerIndex(object):
+    """
+    A functional index on `LOWER(field)`, used by the
+    `CASE_INSENSITIVE_EMAIL` lookups.
+
+    Django < 3.2 has no `Index(Lower(...))`, the sql is written here,
+    with the `create_sql` and `remove_sql` of `Index`.
+    """
+
+    condition = None
+
+    def __init__(self, field, name):
+        self.fields = [field]
+        self.name = name
+
+    def create_sql(self, model, schema_editor):
+        quote = schema_editor.quote_name
+        column = model._meta.get_field(self.fields[0]).column
+        # mysql wants the expression in its own parentheses
+        template = (
+            "CREATE INDEX %s ON %s ((LOWER(%s)))"
+            if schema_editor.connection.vendor == "mysql"
+            else "CREATE INDEX %s ON %s (LOWER(%s))"
+        )
+        return template % (quote(self.name), quote(model._meta.db_table), quote(column))
+
+    def remove_sql(self, model, schema_editor):
+        quote = schema_editor.quote_name
+        if schema_editor.connection.vendor == "mysql":
+            return "DROP INDEX %s ON %s" % (
+                quote(self.name),
+                quote(model._meta.db_table),
+            )
+        return "DROP INDEX %s" % quote(self.name)
+
+
+def get_indexes(apps):
+    """
+    Return `{name: (model, index)}`.
+
+    The models come from `apps`, which can be the historical
+    apps of a migration.
+    """
+    user_model = apps.get_model(settings.AUTH_USER_MODEL)
+    if issubclass(get_user_model(), AbstractUserStatusMixin):
+        status_model = user_model
+        status_user = user_model._meta.pk.name
+    else:
+        status_model = apps.get_model("graphql_auth", "UserStatus")
+        status_user = "user"
+    indexes = {
+        SECONDARY_EMAIL_INDEX: (
+            status_model,
+            Index(fields=["secondary_email"], name=SECONDARY_EMAIL_INDEX),
+        ),
+        STATUS_FLAGS_INDEX: (
+            status_model,
+            Index(fields=["verified", "archived"], name=STATUS_FLAGS_INDEX),
+        ),
+        # the few rows the unverified / archived filters and
+        # cleanups look for, instead of a whole boolean column
+        UNVERIFIED_INDEX: (
+            status_model,
+            Index(
+                fields=[status_user], name=UNVERIFIED_INDEX, condition=Q(verified=False)
+            ),
+        ),
+        ARCHIVED_INDEX: (
+            status_model,
+            Index(
+                fields=[status_user], name=ARCHIVED_INDEX, condition=Q(archived=True)
+            ),
+        ),
+        SECONDARY_EMAIL_LOWER_INDEX: (
+            status_model,
+            LowerIndex("secondary_email", SECONDARY_EMAIL_LOWER_INDEX),
+        ),
+    }
+    try:
+        user_model._meta.get_field("is_active")
+    except FieldDoesNotExist:
+        pass
+    else:
+        indexes[INACTIVE_INDEX] = (
+            user_model,
+            Index(
+                fields=[user_model._meta.pk.name],
+                name=INACTIVE_INDEX,
+                condition=Q(is_active=False),
+            ),
+        )
+    email_field = get_user_model().EMAIL_FIELD
+    try:
+        user_model._meta.get_field(email_field)
+    except FieldDoesNotExist:
+        pass
+    else:
+        indexes[USER_EMAIL_INDEX] = (
+            user_model,
+            Index(fields=[email_field], name=USER_EMAIL_INDEX),
+        )
+        indexes[USER_EMAIL_LOWER_INDEX] = (
+            user_model,
+            LowerIndex(email_field, USER_EMAIL_LOWER_INDEX),
+        )
+    return indexes
+
+
+def get_index_state(connection, model, index):
+    """
+    Return `PRESENT`, `MISSING`, `INVALID` or `UNSUPPORTED`.
+    """
+    name = index.name
+    if index.condition and not connection.features.supports_partial_indexes:
+        return UNSUPPORTED
+    if isinstance(index, LowerIndex) and not supports_expression_indexes(connection):
+        return UNSUPPORTED
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = %s",
+                [name],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return MISSING
+        return PRESENT if row[0] else INVALID
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, model._meta.db_table
+        )
+    return PRESENT if name in constraints else MISSING
+
+
+class AddIndexOnline(Operation):
+    """
+    Create one of the `get_indexes` indexes, if it is not there yet.
+
+    Concurrently on PostgreSQL, with a plain `CREATE INDEX` elsewhere.
+    Partial and `LowerIndex` indexes are skipped on the databases
+    without them.
+    The index is not added to the model state: the models belong to
+    other apps, and the index is optional.
+    """
+
+    atomic = False
+    reduces_to_sql = False
+
+    def __init__(self, name):
+        self.name = name
+
+    def deconstruct(self):
+        return self.__class__.__name__, [self.name], {}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _get_index(self, schema_editor, state):
+        indexes = get_indexes(state.apps)
+        if self.name not in indexes:
+            return None, None
+        model, index = indexes[self.name]
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return None, None
+        return model, index
+
+    def _is_concurrent(self, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return False
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError(
+                "%s cannot run inside a transaction, "
+                "set atomic = False on the migration." % self.__class__.__name__
+            )
+        return True
+
+    # the sql is run here, the schema editors only take
+    # concurrently=True on PostgreSQL from Django 3.0
+    def _add_index(self, schema_editor, model, index, concurrently):
+        sql = str(index.create_sql(model, schema_editor))
+        if concurrently:
+            sql = sql.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+        schema_editor.execute(sql)
+
+    def _remove_index(self, schema_editor, model, index, concurrently):
+        sql = str(index.remove_sql(model, schema_editor))
+        if concurrently:
+            sql = sql.replace("DROP INDEX", "DROP INDEX CONCURRENTLY", 1)
+        schema_editor.execute(sql)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model, index = self._get_index(schema_editor, to_state)
+        if model is None:
+            return
+        concurrently = self._is_concurrent(schema_editor)
+        state = get_index_state(schema_editor.connection, model, index)
+        if state in (PRESENT, UNSUPPORTED):
+            return
+        if state == INVALID:
+            self._remove_index(schema_editor, model, index, concurrently)
+        self._add_index(schema_editor, model, index, concurrently)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model, index = self._get_index(schema_editor, from_state)
+        if model is None:
+            return
+        concurrently = self._is_concurrent(schema_editor)
+        state = get_index_state(schema_editor.connection, model, index)
+        if state in (MISSING, UNSUPPORTED):
+            return
+        self._remove_index(schema_editor, model, index, concurrently)
+
+    def describe(self):
+        return "Create index %s online" % self.name
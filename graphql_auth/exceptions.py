@@ -1,3 +1,5 @@
+from smtplib import SMTPException
+
 from django.utils.translation import gettext as _
 
 
@@ -31,10 +33,22 @@ class TokenScopeError(GraphQLAuthError):
     default_message = _("This token if for something else.")
 
 
+class TokenAlreadyUsed(GraphQLAuthError):
+    default_message = _("This token was already used.")
+
+
 class PasswordAlreadySetError(GraphQLAuthError):
     default_message = _("Password already set for account.")
 
 
+class EmailCircuitOpen(GraphQLAuthError, SMTPException):
+    """
+    the mail server failed too many times, emails are not sent for a while
+    """
+
+    default_message = _("Email delivery is temporarily unavailable.")
+
+
 class WrongUsage(GraphQLAuthError):
     """
     internal exception
@@ -0,0 +1,171 @@
+"""
+A bounded thread pool to send emails in the background,
+without running a broker.
+
+    GRAPHQL_AUTH = {
+        "EMAIL_ASYNC_TASK": "graphql_auth.executors.thread_pool_email_task",
+    }
+"""
+
+import atexit
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections
+
+from .settings import graphql_auth_settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmailThreadPool(object):
+    """
+    Run the email functions on a fixed number of worker threads.
+
+    The queue is bounded. When it is full, `submit` either waits for
+    a free slot (`"block"`, backpressure on the request) or drops the
+    email (`"shed"`), according to `full_policy`.
+    """
+
+    BLOCK = "block"
+    SHED = "shed"
+
+    def __init__(self, workers=2, queue_size=100, full_policy=BLOCK):
+        if full_policy not in (self.BLOCK, self.SHED):
+            raise ValueError("full_policy must be 'block' or 'shed'.")
+        self.workers = workers
+        self.full_policy = full_policy
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.shed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def _start_workers(self):
+        # started on the first submit, not on import, so forking
+        # servers don't end up with a pool without threads
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._work, name="graphql-auth-email-%s" % i, daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                func, args = item
+                try:
+                    func(*args)
+                except Exception:
+                    with self._lock:
+                        self.failed += 1
+                    logger.exception("Failed to send email.")
+                else:
+                    with self._lock:
+                        self.completed += 1
+                finally:
+                    close_old_connections()
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func, args=()):
+        """
+        Queue `func(*args)`. Return `False` if it was shed.
+        """
+        if self._shutdown:
+            raise RuntimeError("Cannot submit emails after shutdown.")
+        self._start_workers()
+        if self.full_policy == self.SHED:
+            try:
+                self._queue.put_nowait((func, args))
+            except queue.Full:
+                with self._lock:
+                    self.shed += 1
+                logger.warning("Email queue is full, email dropped.")
+                return False
+        else:
+            self._queue.put((func, args))
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "queue_size": self._queue.maxsize,
+                "workers": len(self._threads),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "shed": self.shed,
+            }
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting emails. The workers exit after sending
+        everything already queued.
+        """
+        with self._lock:
+            self._shutdown = True
+            threads = self._threads
+        for _ in threads:
+            # waits for a free slot, after the queued emails
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_email_thread_pool():
+    """
+    Return the process wide pool, configured by the
+    `EMAIL_THREAD_POOL_*` settings.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = EmailThreadPool(
+                    workers=app_settings.EMAIL_THREAD_POOL_WORKERS,
+                    queue_size=app_settings.EMAIL_THREAD_POOL_QUEUE_SIZE,
+                    full_policy=app_settings.EMAIL_THREAD_POOL_FULL_POLICY,
+                )
+    return _pool
+
+
+def thread_pool_email_task(func, args):
+    """
+    `EMAIL_ASYNC_TASK` function that sends the email on the pool.
+    """
+    return get_email_thread_pool().submit(func, args)
+
+
+def shutdown_email_thread_pool(wait=True):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_email_thread_pool)
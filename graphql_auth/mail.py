@@ -0,0 +1,418 @@
+"""
+Email delivery helpers.
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from smtplib import (
+    SMTPDataError,
+    SMTPException,
+    SMTPRecipientsRefused,
+    SMTPSenderRefused,
+)
+
+from django.conf import settings as django_settings
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.core.exceptions import ImproperlyConfigured
+from django.test.signals import setting_changed
+
+from .exceptions import EmailCircuitOpen
+from .settings import graphql_auth_settings as app_settings
+
+
+class ConnectionPool(object):
+    """
+    A thread safe pool of open email backend connections.
+
+    Instead of paying the TCP, EHLO, STARTTLS and AUTH round trips
+    on every email, connections are kept open and reused.
+
+    Before being reused, a connection is checked with `NOOP`
+    and connections left idle for longer than `idle_timeout`
+    seconds are closed.
+    """
+
+    def __init__(self, max_size=4, idle_timeout=60, backend=None, **connection_kwargs):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.backend = backend
+        self.connection_kwargs = connection_kwargs
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._idle)
+
+    def _new_connection(self):
+        connection = get_connection(
+            backend=self.backend, fail_silently=False, **self.connection_kwargs
+        )
+        connection.open()
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, connection):
+        # backends that don't keep a socket open (locmem, console...)
+        # have nothing to check
+        smtp = getattr(connection, "connection", False)
+        if smtp is False:
+            return True
+        if smtp is None:
+            return False
+        try:
+            return smtp.noop()[0] == 250
+        except (SMTPException, OSError):
+            return False
+
+    def _is_expired(self, released_at, now):
+        return now - released_at > self.idle_timeout
+
+    def evict_idle(self):
+        """
+        Close the connections idle for longer than `idle_timeout`.
+        """
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            # oldest connections are on the left
+            while self._idle and self._is_expired(self._idle[0][1], now):
+                expired.append(self._idle.popleft()[0])
+        for connection in expired:
+            self._close(connection)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                connection, released_at = self._idle.pop()
+            expired = self._is_expired(released_at, time.monotonic())
+            if expired or not self._is_alive(connection):
+                self._close(connection)
+                continue
+            return connection
+        return self._new_connection()
+
+    def release(self, connection, discard=False):
+        self.evict_idle()
+        with self._lock:
+            if not discard and len(self._idle) < self.max_size:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of the block.
+
+        If the block raises, the connection is closed instead
+        of going back to the pool.
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception:
+            self.release(connection, discard=True)
+            raise
+        else:
+            self.release(connection)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._close(connection)
+
+
+# the server refused one message (its recipients, sender or content):
+# it answered, so it is not a sign of a failing server
+MESSAGE_ERRORS = (SMTPRecipientsRefused, SMTPSenderRefused, SMTPDataError)
+# their aiosmtplib counterparts, matched by name as aiosmtplib is optional
+ASYNC_MESSAGE_ERRORS = {
+    "SMTPRecipientsRefused",
+    "SMTPRecipientRefused",
+    "SMTPSenderRefused",
+    "SMTPDataError",
+}
+
+
+def _aiosmtplib_errors(error):
+    return [
+        cls for cls in type(error).__mro__ if cls.__module__.startswith("aiosmtplib")
+    ]
+
+
+def is_message_error(error):
+    if isinstance(error, MESSAGE_ERRORS):
+        return True
+    return any(
+        cls.__name__ in ASYNC_MESSAGE_ERRORS for cls in _aiosmtplib_errors(error)
+    )
+
+
+def is_server_error(error):
+    if is_message_error(error):
+        return False
+    # SMTPException, socket errors and every aiosmtplib error
+    return isinstance(error, OSError) or bool(_aiosmtplib_errors(error))
+
+
+class CircuitBreaker(object):
+    """
+    Stop calling the mail server after `failure_threshold`
+    consecutive failures.
+
+    While open, calls fail fast with `EmailCircuitOpen`. After
+    `recovery_timeout` seconds a single probe call is let through
+    (half-open): if it succeeds the circuit closes, otherwise it
+    opens again.
+
+    Only server errors (`is_server_error`) count as failures: a refused
+    message means the server is up, and any other error is raised before
+    or after talking to it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self._opened_at >= self.recovery_timeout
+            ):
+                # this call is the probe, the others keep failing fast
+                self.state = self.HALF_OPEN
+                return
+            raise EmailCircuitOpen
+
+    def _on_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def _on_error(self, error):
+        if is_message_error(error):
+            self._on_success()
+        elif is_server_error(error):
+            self._on_failure()
+        else:
+            with self._lock:
+                if self.state == self.HALF_OPEN:
+                    # the probe told nothing about the server, let
+                    # the next call probe again
+                    self.state = self.OPEN
+
+    def call(self, func, *args, **kwargs):
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._on_error(e)
+            raise
+        self._on_success()
+        return result
+
+    async def acall(self, func, *args, **kwargs):
+        self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            self._on_error(e)
+            raise
+        self._on_success()
+        return result
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+_circuit_breaker = None
+
+
+def get_connection_pool():
+    """
+    Return the process wide pool, configured by the
+    `EMAIL_CONNECTION_POOL_*` settings.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = ConnectionPool(
+                    max_size=app_settings.EMAIL_CONNECTION_POOL_SIZE,
+                    idle_timeout=(
+                        app_settings.EMAIL_CONNECTION_POOL_IDLE_TIMEOUT.total_seconds()
+                    ),
+                    **_get_connection_kwargs()
+                )
+    return _connection_pool
+
+
+def get_circuit_breaker():
+    """
+    Return the process wide circuit breaker, configured by the
+    `EMAIL_CIRCUIT_BREAKER_*` settings.
+    """
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        with _connection_pool_lock:
+            if _circuit_breaker is None:
+                recovery = app_settings.EMAIL_CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+                _circuit_breaker = CircuitBreaker(
+                    failure_threshold=(
+                        app_settings.EMAIL_CIRCUIT_BREAKER_FAILURE_THRESHOLD
+                    ),
+                    recovery_timeout=recovery.total_seconds(),
+                )
+    return _circuit_breaker
+
+
+def _get_connection_kwargs():
+    if app_settings.EMAIL_CIRCUIT_BREAKER:
+        # don't let a degraded server hold the request
+        # until the default socket timeout
+        return {"timeout": app_settings.EMAIL_CIRCUIT_BREAKER_TIMEOUT.total_seconds()}
+    return {}
+
+
+def send_email(subject, message, html_message, recipient_list, from_email=None):
+    """
+    Send an email, through the connection pool if `EMAIL_CONNECTION_POOL`
+    is on and the circuit breaker if `EMAIL_CIRCUIT_BREAKER` is on.
+    """
+    kwargs = {
+        "subject": subject,
+        "message": message,
+        "html_message": html_message,
+        "from_email": from_email or app_settings.EMAIL_FROM,
+        "recipient_list": recipient_list,
+        "fail_silently": False,
+    }
+    if app_settings.EMAIL_CIRCUIT_BREAKER:
+        return get_circuit_breaker().call(_send_mail, **kwargs)
+    return _send_mail(**kwargs)
+
+
+def _send_mail(**kwargs):
+    if app_settings.EMAIL_CONNECTION_POOL:
+        with get_connection_pool().connection() as connection:
+            return send_mail(connection=connection, **kwargs)
+    connection_kwargs = _get_connection_kwargs()
+    if connection_kwargs:
+        kwargs["connection"] = get_connection(fail_silently=False, **connection_kwargs)
+    return send_mail(**kwargs)
+
+
+def sync_to_async(func, **kwargs):
+    """
+    `asgiref.sync.sync_to_async`, imported on use.
+
+    asgiref only ships with Django >= 3.0, the sync code works without it.
+    """
+    try:
+        from asgiref.sync import sync_to_async
+    except ImportError:
+        raise ImproperlyConfigured(
+            "The async email methods require asgiref, "
+            "install it with `pip install asgiref`."
+        )
+    return sync_to_async(func, **kwargs)
+
+
+async def asend_email(subject, message, html_message, recipient_list, from_email=None):
+    """
+    Async counterpart of `send_email`.
+
+    With `EMAIL_ASYNC_SMTP_CLIENT` the email is sent with `aiosmtplib`,
+    using the Django `EMAIL_*` settings. Otherwise the blocking
+    `send_email` runs on an executor thread, outside of the thread
+    used by the ORM. Both go through the circuit breaker when
+    `EMAIL_CIRCUIT_BREAKER` is on.
+    """
+    if app_settings.EMAIL_ASYNC_SMTP_CLIENT:
+        args = (subject, message, html_message, recipient_list, from_email)
+        if app_settings.EMAIL_CIRCUIT_BREAKER:
+            return await get_circuit_breaker().acall(_aiosmtplib_send, *args)
+        return await _aiosmtplib_send(*args)
+    return await sync_to_async(send_email, thread_sensitive=False)(
+        subject, message, html_message, recipient_list, from_email
+    )
+
+
+async def _aiosmtplib_send(
+    subject, message, html_message, recipient_list, from_email=None
+):
+    try:
+        import aiosmtplib
+    except ImportError:
+        raise ImproperlyConfigured(
+            "EMAIL_ASYNC_SMTP_CLIENT requires aiosmtplib, "
+            "install it with `pip install aiosmtplib`."
+        )
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=message,
+        from_email=from_email or app_settings.EMAIL_FROM,
+        to=recipient_list,
+    )
+    if html_message:
+        email.attach_alternative(html_message, "text/html")
+    await aiosmtplib.send(
+        email.message(),
+        sender=email.from_email,
+        recipients=email.recipients(),
+        hostname=django_settings.EMAIL_HOST,
+        port=django_settings.EMAIL_PORT,
+        username=django_settings.EMAIL_HOST_USER or None,
+        password=django_settings.EMAIL_HOST_PASSWORD or None,
+        use_tls=django_settings.EMAIL_USE_SSL,
+        start_tls=django_settings.EMAIL_USE_TLS,
+        timeout=django_settings.EMAIL_TIMEOUT,
+    )
+    return 1
+
+
+def close_connection_pool(*args, **kwargs):
+    global _connection_pool, _circuit_breaker
+    with _connection_pool_lock:
+        pool, _connection_pool = _connection_pool, None
+        _circuit_breaker = None
+    if pool is not None:
+        pool.close_all()
+
+
+def reset_connection_pool(*args, **kwargs):
+    setting = kwargs["setting"]
+    if setting == "GRAPHQL_AUTH" or setting.startswith("EMAIL_"):
+        close_connection_pool()
+
+
+setting_changed.connect(reset_connection_pool)
+atexit.register(close_connection_pool)
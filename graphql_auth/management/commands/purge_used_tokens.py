@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from graphql_auth.models import UsedToken
+
+
+class Command(BaseCommand):
+    help = "Delete the expired rows of the graphql_auth used tokens ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows deleted per query.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = UsedToken.purge_expired(options["batch_size"])
+        self.stdout.write("Deleted %s expired tokens." % deleted)
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from graphql_auth.constants import TokenAction
+from graphql_auth.mail import send_email
+from graphql_auth.models import (
+    STATUS_ON_USER,
+    EmailOutbox,
+    UserModel,
+    UserStatus,
+    status_lookup,
+    users_with_status,
+)
+from graphql_auth.settings import graphql_auth_settings as app_settings
+
+ACTIONS = {
+    "password_reset": (
+        TokenAction.PASSWORD_RESET,
+        "PASSWORD_RESET_PATH_ON_EMAIL",
+        "EMAIL_SUBJECT_PASSWORD_RESET",
+        "EMAIL_TEMPLATE_PASSWORD_RESET",
+        "EMAIL_TEMPLATE_PASSWORD_RESET_TXT",
+    ),
+    "activation": (
+        TokenAction.ACTIVATION,
+        "ACTIVATION_PATH_ON_EMAIL",
+        "EMAIL_SUBJECT_ACTIVATION",
+        "EMAIL_TEMPLATE_ACTIVATION",
+        "EMAIL_TEMPLATE_ACTIVATION_TXT",
+    ),
+}
+
+
+def parse_filter(value):
+    try:
+        lookup, value = value.split("=", 1)
+    except ValueError:
+        raise CommandError("Filters must look like field__lookup=value.")
+    if lookup.endswith("__in"):
+        value = value.split(",")
+    return status_lookup(lookup), value
+
+
+class DomainThrottle(object):
+    """
+    Limit the concurrent sends to each recipient domain.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        domain = email.rpartition("@")[2].lower()
+        with self._lock:
+            if domain not in self._semaphores:
+                self._semaphores[domain] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[domain]
+
+
+class Command(BaseCommand):
+    help = (
+        "Send password reset or activation emails to every user matching "
+        "the filters, e.g. after a credential incident."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=sorted(ACTIONS))
+        parser.add_argument(
+            "--filter",
+            dest="filters",
+            action="append",
+            type=parse_filter,
+            default=[],
+            help=(
+                "User queryset filter, e.g. --filter is_active=True "
+                "--filter status__archived=False. Can be repeated."
+            ),
+        )
+        parser.add_argument(
+            "--unverify",
+            action="store_true",
+            help=(
+                "Mark the users whose email was sent as not verified "
+                "(activation only)."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of users fetched and rendered at a time.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=8, help="Number of sending threads."
+        )
+        parser.add_argument(
+            "--per-domain",
+            type=int,
+            default=2,
+            help="Max concurrent sends to the same recipient domain.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "File storing the last processed user pk and the pks of "
+                "the failed sends. If it exists, the campaign resumes "
+                "after that pk and retries the failed sends."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the users that would receive an email.",
+        )
+
+    def handle(self, *args, **options):
+        if options["unverify"] and options["action"] != "activation":
+            raise CommandError("--unverify can only be used with activation.")
+        if not app_settings.EMAIL_BASE_URL:
+            # there is no request to build the links from
+            raise CommandError("EMAIL_BASE_URL must be set to send account emails.")
+
+        queryset = users_with_status().filter(**dict(options["filters"]))
+        if not STATUS_ON_USER:
+            queryset = queryset.filter(status__isnull=False)
+        checkpoint = options["checkpoint"]
+        last_pk, failed_pks = self.read_checkpoint(checkpoint)
+        if last_pk is not None:
+            queryset = queryset.filter(Q(pk__gt=last_pk) | Q(pk__in=failed_pks))
+        self.failed_pks = set(failed_pks)
+        # the highest processed pk, the retried failed pks are below it
+        self.last_pk = last_pk
+
+        if options["dry_run"]:
+            self.stdout.write("%s users would receive an email." % queryset.count())
+            return
+
+        self.throttle = DomainThrottle(options["per_domain"])
+        self.sent = self.failed = 0
+        self._counter_lock = threading.Lock()
+        users = queryset.order_by("pk")
+        chunk = []
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for user in users.iterator(chunk_size=options["chunk_size"]):
+                chunk.append(user)
+                if len(chunk) == options["chunk_size"]:
+                    self.send_chunk(executor, chunk, options)
+                    chunk = []
+            if chunk:
+                self.send_chunk(executor, chunk, options)
+        self.stdout.write("Sent %s emails, %s failed." % (self.sent, self.failed))
+
+    def send_chunk(self, executor, users, options):
+        action, *names = ACTIONS[options["action"]]
+        path, subject, template, text_template = (
+            getattr(app_settings, name) for name in names
+        )
+        # render (and sign the tokens) here, the threads only do network io
+        emails = {
+            user.pk: user.status.send_action_email(
+                None, action, path, subject, template, text_template, deliver=False
+            )
+            for user in users
+            if getattr(user, UserModel.EMAIL_FIELD)
+        }
+        if app_settings.EMAIL_OUTBOX:
+            for email in emails.values():
+                EmailOutbox.enqueue(**email)
+            self.sent += len(emails)
+            sent_pks = list(emails)
+        else:
+            futures = {
+                pk: executor.submit(self.deliver, email) for pk, email in emails.items()
+            }
+            wait(futures.values())
+            sent_pks = [pk for pk, future in futures.items() if future.result()]
+
+        if options["unverify"] and sent_pks:
+            if STATUS_ON_USER:
+                UserModel._default_manager.filter(pk__in=sent_pks).update(
+                    verified=False
+                )
+            else:
+                UserStatus._default_manager.filter(user__in=sent_pks).update(
+                    verified=False
+                )
+        # pks are kept as strings, as read from the checkpoint
+        self.failed_pks.difference_update(str(user.pk) for user in users)
+        self.failed_pks.update(str(pk) for pk in set(emails) - set(sent_pks))
+        if self.last_pk is None or users[-1].pk > self.last_pk:
+            self.last_pk = users[-1].pk
+        self.write_checkpoint(options["checkpoint"], self.last_pk, self.failed_pks)
+
+    def deliver(self, email):
+        recipient = email["recipient_list"][0]
+        with self.throttle.get(recipient):
+            try:
+                send_email(**email)
+            except Exception as e:
+                self.stderr.write("Failed to send to %s: %s" % (recipient, e))
+                success = False
+            else:
+                success = True
+        with self._counter_lock:
+            if success:
+                self.sent += 1
+            else:
+                self.failed += 1
+        return success
+
+    def read_checkpoint(self, path):
+        """
+        Return the last processed pk and the pks of the failed sends.
+        """
+        if not path or not os.path.exists(path):
+            return None, []
+        with open(path) as f:
+            try:
+                data = json.load(f)
+                last_pk, failed_pks = data["last_pk"], data["failed"]
+            except (ValueError, TypeError, KeyError):
+                raise CommandError("%s is not a checkpoint file." % path)
+        # compared as pks, not as strings
+        return UserModel._meta.pk.to_python(last_pk), failed_pks
+
+    def write_checkpoint(self, path, pk, failed_pks):
+        if not path:
+            return
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"last_pk": str(pk), "failed": sorted(failed_pks)}, f)
+        os.replace(tmp, path)
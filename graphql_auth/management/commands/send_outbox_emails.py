@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from graphql_auth.models import EmailOutbox
+from graphql_auth.settings import graphql_auth_settings as app_settings
+
+
+class Command(BaseCommand):
+    help = "Deliver the emails waiting in the graphql_auth outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=app_settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="Number of emails claimed per batch.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox instead of exiting when it is empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls when the outbox is empty.",
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = EmailOutbox.process_batch(options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write("Sent %s emails, %s failed." % (total_sent, total_failed))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from graphql_auth.exceptions import EmailAlreadyInUse
+from graphql_auth.models import EmailAddress, users_with_status
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the graphql_auth EmailAddress table from the users "
+        "primary and secondary emails."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users fetched at a time.",
+        )
+
+    def handle(self, *args, **options):
+        users = (
+            users_with_status()
+            .order_by("pk")
+            .iterator(chunk_size=options["batch_size"])
+        )
+        synced = conflicts = 0
+        for user in users:
+            try:
+                EmailAddress.sync(user, getattr(user, "status", None))
+            except EmailAlreadyInUse:
+                conflicts += 1
+                self.stderr.write(
+                    "User %s: email already used by other user." % user.pk
+                )
+            else:
+                synced += 1
+        self.stdout.write("Synced %s users, %s conflicts." % (synced, conflicts))
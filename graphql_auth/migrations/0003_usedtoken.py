@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("graphql_auth", "0002_emailoutbox")]
+
+    operations = [
+        migrations.CreateModel(
+            name="UsedToken",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("digest", models.CharField(max_length=64, unique=True)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+        )
+    ]
@@ -1,3 +1,4 @@
+import logging
 from smtplib import SMTPException
 
 from django.core.signing import BadSignature, SignatureExpired
@@ -14,21 +15,29 @@ from graphql_jwt.decorators import token_auth
 
 from .forms import RegisterForm, EmailForm, UpdateAccountForm, PasswordLessRegisterForm
 from .bases import Output
-from .models import UserStatus
+from .models import UserStatus, UsedToken, deliver_email, users_with_status
 from .settings import graphql_auth_settings as app_settings
 from .exceptions import (
     UserAlreadyVerified,
     UserNotVerified,
     WrongUsage,
     TokenScopeError,
+    TokenAlreadyUsed,
     EmailAlreadyInUse,
     InvalidCredentials,
     PasswordAlreadySetError,
 )
 from .constants import Messages, TokenAction
-from .utils import revoke_user_refresh_token, get_token_payload, using_refresh_tokens
+from .utils import (
+    revoke_user_refresh_token,
+    get_token_payload,
+    using_refresh_tokens,
+    get_cached_token_error,
+    cache_token_error,
+)
 from .shortcuts import get_user_by_email, get_user_to_login
 from .signals import user_registered, user_verified
+from .tasks import run_email_task
 from .decorators import (
     password_confirmation_required,
     verification_required,
@@ -41,6 +50,62 @@ if app_settings.EMAIL_ASYNC_TASK and isinstance(app_settings.EMAIL_ASYNC_TASK, s
 else:
     async_email_func = None
 
+logger = logging.getLogger(__name__)
+
+
+def dispatch_email(func, *args):
+    """
+    Call the email function, through `EMAIL_ASYNC_TASK` if set.
+
+    With `EMAIL_ASYNC_TASK_SERIALIZABLE`, `EMAIL_ASYNC_TASK` gets
+    `run_email_task` and an `EmailTask` instead of the bound method
+    and the request.
+
+    With `EMAIL_SEND_ON_COMMIT`, inside a transaction, the delivery
+    waits for the commit: no network I/O happens while the transaction
+    is open and nothing is sent if it is rolled back. The checks (e.g.
+    `UserAlreadyVerified`) and the rendering still run right away, so
+    their errors reach the client. Delivery failures can't be returned
+    anymore, so they are logged.
+    """
+    serializable = async_email_func and app_settings.EMAIL_ASYNC_TASK_SERIALIZABLE
+    on_commit = (
+        app_settings.EMAIL_SEND_ON_COMMIT
+        and transaction.get_connection().in_atomic_block
+    )
+    if not on_commit:
+        if serializable:
+            task = func(*args, task=True)
+            if task is None:  # e.g. during the email cooldown
+                return None
+            return async_email_func(run_email_task, (task,))
+        if async_email_func:
+            return async_email_func(func, args)
+        return func(*args)
+
+    if serializable:
+        task = func(*args, task=True)
+        if task is None:
+            return None
+        deliver, deliver_args = run_email_task, (task,)
+    else:
+        email = func(*args, deliver=False)
+        if email is None:
+            return None
+        deliver, deliver_args = deliver_email, (email,)
+
+    def dispatch_on_commit():
+        try:
+            if async_email_func:
+                async_email_func(deliver, deliver_args)
+            else:
+                deliver(*deliver_args)
+        except Exception:
+            logger.exception("Failed to send email after commit.")
+
+    transaction.on_commit(dispatch_on_commit)
+    return None
+
 
 class RegisterMixin(Output):
     """
@@ -91,7 +156,10 @@ class RegisterMixin(Output):
                 if f.is_valid():
                     email = kwargs.get(UserModel.EMAIL_FIELD, False)
                     UserStatus.clean_email(email)
-                    user = f.save()
+                    user = f.save(commit=False)
+                    UserStatus.attach(user)
+                    user.save()
+                    f.save_m2m()
                     send_activation = (
                         app_settings.SEND_ACTIVATION_EMAIL is True and email
                     )
@@ -101,20 +169,10 @@ class RegisterMixin(Output):
                         and email
                     )
                     if send_activation:
-                        # TODO CHECK FOR EMAIL ASYNC SETTING
-                        if async_email_func:
-                            async_email_func(user.status.send_activation_email, (info,))
-                        else:
-                            user.status.send_activation_email(info)
+                        dispatch_email(user.status.send_activation_email, info)
 
                     if send_password_set:
-                        # TODO CHECK FOR EMAIL ASYNC SETTING
-                        if async_email_func:
-                            async_email_func(
-                                user.status.send_password_set_email, (info,)
-                            )
-                        else:
-                            user.status.send_password_set_email(info)
+                        dispatch_email(user.status.send_password_set_email, info)
 
                     user_registered.send(sender=cls, user=user)
 
@@ -152,16 +210,26 @@ class VerifyAccountMixin(Output):
 
     @classmethod
     def resolve_mutation(cls, root, info, **kwargs):
+        token = kwargs.get("token")
+        error = get_cached_token_error(token, TokenAction.ACTIVATION)
+        if error:
+            return cls(success=False, errors=getattr(Messages, error))
         try:
-            token = kwargs.get("token")
             UserStatus.verify(token)
+            # a second click can only be "already verified"
+            cache_token_error(token, TokenAction.ACTIVATION, "ALREADY_VERIFIED")
             return cls(success=True)
         except UserAlreadyVerified:
-            return cls(success=False, errors=Messages.ALREADY_VERIFIED)
+            error = "ALREADY_VERIFIED"
         except SignatureExpired:
-            return cls(success=False, errors=Messages.EXPIRED_TOKEN)
-        except (BadSignature, TokenScopeError):
+            error = "EXPIRED_TOKEN"
+        except TokenScopeError:
+            # a token of another mutation, it can still be valid there
             return cls(success=False, errors=Messages.INVALID_TOKEN)
+        except (BadSignature, TokenAlreadyUsed):
+            error = "INVALID_TOKEN"
+        cache_token_error(token, TokenAction.ACTIVATION, error)
+        return cls(success=False, errors=getattr(Messages, error))
 
 
 class VerifySecondaryEmailMixin(Output):
@@ -182,19 +250,31 @@ class VerifySecondaryEmailMixin(Output):
 
     @classmethod
     def resolve_mutation(cls, root, info, **kwargs):
+        token = kwargs.get("token")
+        error = get_cached_token_error(token, TokenAction.ACTIVATION_SECONDARY_EMAIL)
+        if error:
+            return cls(success=False, errors=getattr(Messages, error))
         try:
-            token = kwargs.get("token")
             UserStatus.verify_secondary_email(token)
+            # the email is now taken by this user
+            cache_token_error(
+                token, TokenAction.ACTIVATION_SECONDARY_EMAIL, "EMAIL_IN_USE"
+            )
             return cls(success=True)
         except EmailAlreadyInUse:
             # while the token was sent and the user haven't
             # verified, the email was free. If other account
             # was created with it, it is already in use.
-            return cls(success=False, errors=Messages.EMAIL_IN_USE)
+            error = "EMAIL_IN_USE"
         except SignatureExpired:
-            return cls(success=False, errors=Messages.EXPIRED_TOKEN)
-        except (BadSignature, TokenScopeError):
+            error = "EXPIRED_TOKEN"
+        except TokenScopeError:
+            # a token of another mutation, it can still be valid there
             return cls(success=False, errors=Messages.INVALID_TOKEN)
+        except (BadSignature, TokenAlreadyUsed):
+            error = "INVALID_TOKEN"
+        cache_token_error(token, TokenAction.ACTIVATION_SECONDARY_EMAIL, error)
+        return cls(success=False, errors=getattr(Messages, error))
 
 
 class ResendActivationEmailMixin(Output):
@@ -216,10 +296,7 @@ class ResendActivationEmailMixin(Output):
             f = EmailForm({"email": email})
             if f.is_valid():
                 user = get_user_by_email(email)
-                if async_email_func:
-                    async_email_func(user.status.resend_activation_email, (info,))
-                else:
-                    user.status.resend_activation_email(info)
+                dispatch_email(user.status.resend_activation_email, info)
                 return cls(success=True)
             return cls(success=False, errors=f.errors.get_json_data())
         except ObjectDoesNotExist:
@@ -250,12 +327,7 @@ class SendPasswordResetEmailMixin(Output):
             f = EmailForm({"email": email})
             if f.is_valid():
                 user = get_user_by_email(email)
-                if async_email_func:
-                    async_email_func(
-                        user.status.send_password_reset_email, (info, [email])
-                    )
-                else:
-                    user.status.send_password_reset_email(info, [email])
+                dispatch_email(user.status.send_password_reset_email, info, [email])
                 return cls(success=True)
             return cls(success=False, errors=f.errors.get_json_data())
         except ObjectDoesNotExist:
@@ -265,10 +337,7 @@ class SendPasswordResetEmailMixin(Output):
         except UserNotVerified:
             user = get_user_by_email(email)
             try:
-                if async_email_func:
-                    async_email_func(user.status.resend_activation_email, (info,))
-                else:
-                    user.status.resend_activation_email(info)
+                dispatch_email(user.status.resend_activation_email, info)
                 return cls(
                     success=False,
                     errors={"email": Messages.NOT_VERIFIED_PASSWORD_RESET},
@@ -294,30 +363,46 @@ class PasswordResetMixin(Output):
 
     @classmethod
     def resolve_mutation(cls, root, info, **kwargs):
+        token = kwargs.pop("token")
+        error = get_cached_token_error(token, TokenAction.PASSWORD_RESET)
+        if error:
+            return cls(success=False, errors=getattr(Messages, error))
         try:
-            token = kwargs.pop("token")
             payload = get_token_payload(
                 token,
                 TokenAction.PASSWORD_RESET,
                 app_settings.EXPIRATION_PASSWORD_RESET_TOKEN,
             )
-            user = UserModel._default_manager.get(**payload)
+            user = users_with_status().get(**payload)
             f = cls.form(user, kwargs)
             if f.is_valid():
-                revoke_user_refresh_token(user)
-                user = f.save()
+                with transaction.atomic():
+                    UsedToken.consume(
+                        token, app_settings.EXPIRATION_PASSWORD_RESET_TOKEN
+                    )
+                    revoke_user_refresh_token(user)
+                    user = f.save()
 
                 if user.status.verified is False:
                     user.status.verified = True
                     user.status.save(update_fields=["verified"])
                     user_verified.send(sender=cls, user=user)
 
+                if app_settings.SINGLE_USE_TOKENS:
+                    cache_token_error(
+                        token, TokenAction.PASSWORD_RESET, "INVALID_TOKEN"
+                    )
                 return cls(success=True)
             return cls(success=False, errors=f.errors.get_json_data())
         except SignatureExpired:
-            return cls(success=False, errors=Messages.EXPIRED_TOKEN)
-        except (BadSignature, TokenScopeError):
+            error = "EXPIRED_TOKEN"
+        except TokenScopeError:
+            # a token of another mutation, it can still be valid there
             return cls(success=False, errors=Messages.INVALID_TOKEN)
+        except (BadSignature, TokenAlreadyUsed):
+            error = "INVALID_TOKEN"
+        cache_token_error(token, TokenAction.PASSWORD_RESET, error)
+        return cls(success=False, errors=getattr(Messages, error))
 
 
 class PasswordSetMixin(Output):
@@ -344,14 +429,16 @@ class PasswordSetMixin(Output):
                 TokenAction.PASSWORD_SET,
                 app_settings.EXPIRATION_PASSWORD_SET_TOKEN,
             )
-            user = UserModel._default_manager.get(**payload)
+            user = users_with_status().get(**payload)
             f = cls.form(user, kwargs)
             if f.is_valid():
                 # Check if user has already set a password
                 if user.has_usable_password():
                     raise PasswordAlreadySetError
-                revoke_user_refresh_token(user)
-                user = f.save()
+                with transaction.atomic():
+                    UsedToken.consume(token, app_settings.EXPIRATION_PASSWORD_SET_TOKEN)
+                    revoke_user_refresh_token(user)
+                    user = f.save()
 
                 if user.status.verified is False:
                     user.status.verified = True
@@ -361,7 +448,7 @@ class PasswordSetMixin(Output):
             return cls(success=False, errors=f.errors.get_json_data())
         except SignatureExpired:
             return cls(success=False, errors=Messages.EXPIRED_TOKEN)
-        except (BadSignature, TokenScopeError):
+        except (BadSignature, TokenScopeError, TokenAlreadyUsed):
             return cls(success=False, errors=Messages.INVALID_TOKEN)
         except (PasswordAlreadySetError):
             return cls(success=False, errors=Messages.PASSWORD_ALREADY_SET)
@@ -578,12 +665,7 @@ class SendSecondaryEmailActivationMixin(Output):
             f = EmailForm({"email": email})
             if f.is_valid():
                 user = info.context.user
-                if async_email_func:
-                    async_email_func(
-                        user.status.send_secondary_email_activation, (info, email)
-                    )
-                else:
-                    user.status.send_secondary_email_activation(info, email)
+                dispatch_email(user.status.send_secondary_email_activation, info, email)
                 return cls(success=True)
             return cls(success=False, errors=f.errors.get_json_data())
         except EmailAlreadyInUse:
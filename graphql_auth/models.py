@@ -1,135 +1,445 @@
 import time
+
 from django.db import models
 from django.conf import settings as django_settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.core.mail import send_mail
-from django.contrib.sites.shortcuts import get_current_site
+from django.utils import timezone
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.db import IntegrityError, transaction
 
 
 from .settings import graphql_auth_settings as app_settings
 from .constants import TokenAction
-from .utils import get_token, get_token_payload
+from .mail import send_email, asend_email, sync_to_async
+from .renderers import get_renderer
+from .tasks import EmailTask
+from .utils import (
+    get_token,
+    get_token_payload,
+    get_token_digest,
+    get_url_context,
+    email_cooldown,
+    email_lookup,
+    filter_email,
+    normalize_email,
+)
 from .exceptions import (
     UserAlreadyVerified,
     UserNotVerified,
     EmailAlreadyInUse,
+    EmailCircuitOpen,
+    TokenAlreadyUsed,
     WrongUsage,
 )
 from .signals import user_verified
+from .abstract_models import AbstractUserStatusMixin
 
 UserModel = get_user_model()
 
 
-class UserStatus(models.Model):
+# the status fields are on the user row, see AbstractUserStatusMixin
+STATUS_ON_USER = issubclass(UserModel, AbstractUserStatusMixin)
+
+
+def users_with_status():
     """
-    A helper model that handles user account stuff.
+    User queryset that loads `user.status` in the same query.
     """
+    queryset = UserModel._default_manager.all()
+    if STATUS_ON_USER:
+        return queryset
+    return queryset.select_related("status")
 
-    user = models.OneToOneField(
-        django_settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="status"
-    )
-    verified = models.BooleanField(default=False)
-    archived = models.BooleanField(default=False)
-    secondary_email = models.EmailField(blank=True, null=True)
+
+def status_lookup(lookup):
+    """
+    Translate a `status__<field>` user lookup
+    when the status fields are on the user row.
+    """
+    if STATUS_ON_USER and lookup.startswith("status__"):
+        return lookup[len("status__") :]
+    return lookup
+
+
+def deliver_email(email):
+    """
+    Send an email rendered by `UserStatus.render_email`,
+    or write it to the outbox when `EMAIL_OUTBOX` is on.
+    """
+    if app_settings.EMAIL_OUTBOX:
+        return EmailOutbox.enqueue(**email)
+    try:
+        return send_email(**email)
+    except EmailCircuitOpen:
+        if app_settings.EMAIL_CIRCUIT_BREAKER_OUTBOX_FALLBACK:
+            return EmailOutbox.enqueue(**email)
+        raise
+
+
+class BaseUserStatus(object):
+    """
+    The account actions of `user.status`, see `UserStatus`
+    and `InlineUserStatus`.
+    """
 
     def __str__(self):
         return "%s - status" % (self.user)
 
-    def send(self, subject, template, context, recipient_list=None):
-        _subject = render_to_string(subject, context).replace("\n", " ").strip()
-        html_message = render_to_string(template, context)
-        message = strip_tags(html_message)
-
-        return send_mail(
-            subject=_subject,
-            from_email=app_settings.EMAIL_FROM,
-            message=message,
-            html_message=html_message,
-            recipient_list=(
+    def render_email(
+        self, subject, template, context, recipient_list=None, text_template=None
+    ):
+        renderer = get_renderer()
+        _subject = renderer.render(subject, context).replace("\n", " ").strip()
+        html_message = renderer.render(template, context)
+        if text_template:
+            message = renderer.render(text_template, context)
+        else:
+            message = renderer.render_text(template, context)
+        return {
+            "subject": _subject,
+            "message": message,
+            "html_message": html_message,
+            "recipient_list": (
                 recipient_list or [getattr(self.user, UserModel.EMAIL_FIELD)]
             ),
-            fail_silently=False,
+        }
+
+    def send(self, *args, deliver=True, **kwargs):
+        """
+        Render and send the email.
+
+        With `deliver=False`, return the rendered email instead,
+        used by the async methods to deliver it themselves.
+        """
+        email = self.render_email(*args, **kwargs)
+        if not deliver:
+            return email
+        return deliver_email(email)
+
+    # the database and rendering work is run with thread_sensitive=True
+    # on purpose: in the thread of the sync code (and its connection and
+    # transaction), which is not the default before asgiref 3.3
+    async def adeliver(self, email):
+        if app_settings.EMAIL_OUTBOX:
+            return await sync_to_async(EmailOutbox.enqueue, thread_sensitive=True)(
+                **email
+            )
+        try:
+            return await asend_email(**email)
+        except EmailCircuitOpen:
+            if app_settings.EMAIL_CIRCUIT_BREAKER_OUTBOX_FALLBACK:
+                return await sync_to_async(EmailOutbox.enqueue, thread_sensitive=True)(
+                    **email
+                )
+            raise
+
+    async def asend(self, *args, **kwargs):
+        email = await sync_to_async(self.render_email, thread_sensitive=True)(
+            *args, **kwargs
         )
+        return await self.adeliver(email)
+
+    async def _asend_with(self, method, *args, **kwargs):
+        # everything up to the delivery (token, context, checks and
+        # rendering) may touch the database, so it runs thread sensitive
+        email = await sync_to_async(method, thread_sensitive=True)(
+            *args, deliver=False, **kwargs
+        )
+        if email is None:
+            return None
+        return await self.adeliver(email)
 
     def get_email_context(self, info, path, action, **kwargs):
+        """
+        `info` can be `None` when `EMAIL_BASE_URL` is set.
+        """
+        request = info.context if info else None
+        return self.build_email_context(
+            get_url_context(request), path, action, request=request, **kwargs
+        )
+
+    def build_email_context(self, url_context, path, action, request=None, **kwargs):
         token = get_token(self.user, action, **kwargs)
-        site = get_current_site(info.context)
         return {
             "user": self.user,
-            "request": info.context,
+            "request": request,
             "token": token,
-            "port": info.context.get_port(),
-            "site_name": site.name,
-            "domain": site.domain,
-            "protocol": "https" if info.context.is_secure() else "http",
+            **url_context,
             "path": path,
             "timestamp": time.time(),
             **app_settings.EMAIL_TEMPLATE_VARIABLES,
         }
 
+    def send_email_task(self, task, request=None, deliver=True):
+        email_context = self.build_email_context(
+            task.url_context,
+            task.path,
+            task.action,
+            request=request,
+            **(task.token_kwargs or {})
+        )
+        return self.send(
+            task.subject,
+            task.template,
+            email_context,
+            task.recipient_list,
+            text_template=task.text_template,
+            deliver=deliver,
+        )
+
+    def send_action_email(
+        self,
+        info,
+        action,
+        path,
+        subject,
+        template,
+        text_template=None,
+        recipient_list=None,
+        task=False,
+        deliver=True,
+        **token_kwargs
+    ):
+        """
+        Send the email with a token for `action`.
+
+        With `task=True` nothing is sent, an `EmailTask` is returned
+        instead, to be sent later with `tasks.run_email_task`.
+        """
+        request = info.context if info else None
+        email_task = EmailTask(
+            user_pk=self.user.pk,
+            action=action,
+            path=path,
+            subject=subject,
+            template=template,
+            text_template=text_template,
+            recipient_list=recipient_list,
+            url_context=get_url_context(request),
+            token_kwargs=token_kwargs,
+        )
+        if task:
+            return email_task
+        return self.send_email_task(email_task, request=request, deliver=deliver)
+
     def send_activation_email(self, info, *args, **kwargs):
-        email_context = self.get_email_context(
-            info, app_settings.ACTIVATION_PATH_ON_EMAIL, TokenAction.ACTIVATION
+        return self.send_action_email(
+            info,
+            TokenAction.ACTIVATION,
+            app_settings.ACTIVATION_PATH_ON_EMAIL,
+            app_settings.EMAIL_SUBJECT_ACTIVATION,
+            app_settings.EMAIL_TEMPLATE_ACTIVATION,
+            app_settings.EMAIL_TEMPLATE_ACTIVATION_TXT,
+            *args,
+            **kwargs
         )
-        template = app_settings.EMAIL_TEMPLATE_ACTIVATION
-        subject = app_settings.EMAIL_SUBJECT_ACTIVATION
-        return self.send(subject, template, email_context, *args, **kwargs)
 
     def resend_activation_email(self, info, *args, **kwargs):
         if self.verified is True:
             raise UserAlreadyVerified
-        email_context = self.get_email_context(
-            info, app_settings.ACTIVATION_PATH_ON_EMAIL, TokenAction.ACTIVATION
-        )
-        template = app_settings.EMAIL_TEMPLATE_ACTIVATION_RESEND
-        subject = app_settings.EMAIL_SUBJECT_ACTIVATION_RESEND
-        return self.send(subject, template, email_context, *args, **kwargs)
+        with email_cooldown(self.user, TokenAction.ACTIVATION) as allowed:
+            if not allowed:
+                return None
+            return self.send_action_email(
+                info,
+                TokenAction.ACTIVATION,
+                app_settings.ACTIVATION_PATH_ON_EMAIL,
+                app_settings.EMAIL_SUBJECT_ACTIVATION_RESEND,
+                app_settings.EMAIL_TEMPLATE_ACTIVATION_RESEND,
+                app_settings.EMAIL_TEMPLATE_ACTIVATION_RESEND_TXT,
+                *args,
+                **kwargs
+            )
 
     def send_password_set_email(self, info, *args, **kwargs):
-        email_context = self.get_email_context(
-            info, app_settings.PASSWORD_SET_PATH_ON_EMAIL, TokenAction.PASSWORD_SET
+        return self.send_action_email(
+            info,
+            TokenAction.PASSWORD_SET,
+            app_settings.PASSWORD_SET_PATH_ON_EMAIL,
+            app_settings.EMAIL_SUBJECT_PASSWORD_SET,
+            app_settings.EMAIL_TEMPLATE_PASSWORD_SET,
+            app_settings.EMAIL_TEMPLATE_PASSWORD_SET_TXT,
+            *args,
+            **kwargs
         )
-        template = app_settings.EMAIL_TEMPLATE_PASSWORD_SET
-        subject = app_settings.EMAIL_SUBJECT_PASSWORD_SET
-        return self.send(subject, template, email_context, *args, **kwargs)
 
     def send_password_reset_email(self, info, *args, **kwargs):
-        email_context = self.get_email_context(
-            info, app_settings.PASSWORD_RESET_PATH_ON_EMAIL, TokenAction.PASSWORD_RESET
-        )
-        template = app_settings.EMAIL_TEMPLATE_PASSWORD_RESET
-        subject = app_settings.EMAIL_SUBJECT_PASSWORD_RESET
-        return self.send(subject, template, email_context, *args, **kwargs)
+        with email_cooldown(self.user, TokenAction.PASSWORD_RESET) as allowed:
+            if not allowed:
+                return None
+            return self.send_action_email(
+                info,
+                TokenAction.PASSWORD_RESET,
+                app_settings.PASSWORD_RESET_PATH_ON_EMAIL,
+                app_settings.EMAIL_SUBJECT_PASSWORD_RESET,
+                app_settings.EMAIL_TEMPLATE_PASSWORD_RESET,
+                app_settings.EMAIL_TEMPLATE_PASSWORD_RESET_TXT,
+                *args,
+                **kwargs
+            )
 
-    def send_secondary_email_activation(self, info, email):
-        if not self.email_is_free(email):
+    def send_secondary_email_activation(self, info, email, **kwargs):
+        if not UserStatus.email_is_free(email):
             raise EmailAlreadyInUse
-        email_context = self.get_email_context(
+        return self.send_action_email(
             info,
-            app_settings.ACTIVATION_SECONDARY_EMAIL_PATH_ON_EMAIL,
             TokenAction.ACTIVATION_SECONDARY_EMAIL,
+            app_settings.ACTIVATION_SECONDARY_EMAIL_PATH_ON_EMAIL,
+            app_settings.EMAIL_SUBJECT_SECONDARY_EMAIL_ACTIVATION,
+            app_settings.EMAIL_TEMPLATE_SECONDARY_EMAIL_ACTIVATION,
+            app_settings.EMAIL_TEMPLATE_SECONDARY_EMAIL_ACTIVATION_TXT,
+            recipient_list=[email],
             secondary_email=email,
+            **kwargs
+        )
+
+    async def asend_activation_email(self, info, *args, **kwargs):
+        return await self._asend_with(self.send_activation_email, info, *args, **kwargs)
+
+    async def aresend_activation_email(self, info, *args, **kwargs):
+        return await self._asend_with(
+            self.resend_activation_email, info, *args, **kwargs
+        )
+
+    async def asend_password_set_email(self, info, *args, **kwargs):
+        return await self._asend_with(
+            self.send_password_set_email, info, *args, **kwargs
+        )
+
+    async def asend_password_reset_email(self, info, *args, **kwargs):
+        return await self._asend_with(
+            self.send_password_reset_email, info, *args, **kwargs
+        )
+
+    async def asend_secondary_email_activation(self, info, email):
+        return await self._asend_with(self.send_secondary_email_activation, info, email)
+
+    def swap_emails(self):
+        if not self.secondary_email:
+            raise WrongUsage
+        with transaction.atomic():
+            EMAIL_FIELD = UserModel.EMAIL_FIELD
+            primary = getattr(self.user, EMAIL_FIELD)
+            setattr(self.user, EMAIL_FIELD, self.secondary_email)
+            self.secondary_email = primary
+            self.user.save(update_fields=[EMAIL_FIELD])
+            self.save(update_fields=["secondary_email"])
+
+    def remove_secondary_email(self):
+        if not self.secondary_email:
+            raise WrongUsage
+        with transaction.atomic():
+            self.secondary_email = None
+            self.save(update_fields=["secondary_email"])
+
+
+class UserStatus(BaseUserStatus, models.Model):
+    """
+    A helper model that handles user account stuff.
+    """
+
+    user = models.OneToOneField(
+        django_settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="status"
+    )
+    verified = models.BooleanField(default=False)
+    archived = models.BooleanField(default=False)
+    secondary_email = models.EmailField(blank=True, null=True)
+
+    @classmethod
+    def attach(cls, user):
+        """
+        Attach an unsaved status to the unsaved `user`.
+
+        The `post_save` signal of the user inserts it, without
+        looking for an existing one, and `user.status` needs
+        no query afterwards.
+        """
+        if not STATUS_ON_USER:
+            # also sets the user.status cache
+            cls(user=user)
+
+    @classmethod
+    def get_for_user(cls, user):
+        if STATUS_ON_USER:
+            return user.status
+        return cls._default_manager.get(user=user)
+
+    @classmethod
+    def secondary_emails(cls):
+        """
+        Return the queryset holding the secondary emails
+        and the name of its user pk column.
+        """
+        if STATUS_ON_USER:
+            return UserModel._default_manager.all(), "pk"
+        return cls._default_manager.all(), "user"
+
+    @classmethod
+    def get_user_by_secondary_email(cls, email):
+        """
+        Raise `ObjectDoesNotExist`.
+        """
+        if STATUS_ON_USER:
+            return filter_email(
+                UserModel._default_manager, "secondary_email", email
+            ).get()
+        return (
+            filter_email(
+                cls._default_manager.select_related("user"), "secondary_email", email
+            )
+            .get()
+            .user
         )
-        template = app_settings.EMAIL_TEMPLATE_SECONDARY_EMAIL_ACTIVATION
-        subject = app_settings.EMAIL_SUBJECT_SECONDARY_EMAIL_ACTIVATION
-        return self.send(subject, template, email_context, recipient_list=[email])
 
     @classmethod
     def email_is_free(cls, email):
-        try:
-            UserModel._default_manager.get(**{UserModel.EMAIL_FIELD: email})
-            return False
-        except Exception:
-            pass
-        try:
-            UserStatus._default_manager.get(secondary_email=email)
-            return False
-        except Exception:
-            pass
-        return True
+        if app_settings.EMAIL_ADDRESS_TABLE:
+            return not EmailAddress._default_manager.filter(
+                normalized=EmailAddress.normalize(email)
+            ).exists()
+        # a single query, that stops at the first primary or secondary match
+        users = filter_email(UserModel._default_manager, UserModel.EMAIL_FIELD, email)
+        statuses, user_column = cls.secondary_emails()
+        statuses = filter_email(statuses, "secondary_email", email)
+        return not (
+            users.values("pk").union(statuses.values(user_column), all=True).exists()
+        )
+
+    @classmethod
+    def emails_in_use(cls, emails):
+        """
+        Return the set of `emails` that are the primary or secondary
+        email of some user, in a single query.
+        """
+        emails = list(emails)
+        if not emails:
+            return set()
+        if app_settings.EMAIL_ADDRESS_TABLE:
+            normalized = {email: EmailAddress.normalize(email) for email in emails}
+            in_use = set(
+                EmailAddress._default_manager.filter(
+                    normalized__in=normalized.values()
+                ).values_list("normalized", flat=True)
+            )
+            return {email for email in emails if normalized[email] in in_use}
+        normalized = {email: normalize_email(email) for email in emails}
+        users, user_field = email_lookup(
+            UserModel._default_manager, UserModel.EMAIL_FIELD
+        )
+        statuses, status_field = email_lookup(
+            cls.secondary_emails()[0], "secondary_email"
+        )
+        in_use = set(
+            users.filter(**{user_field + "__in": normalized.values()})
+            .values_list(user_field, flat=True)
+            .union(
+                statuses.filter(
+                    **{status_field + "__in": normalized.values()}
+                ).values_list(status_field, flat=True),
+                all=True,
+            )
+        )
+        return {email for email in emails if normalized[email] in in_use}
 
     @classmethod
     def clean_email(cls, email=False):
@@ -142,11 +452,13 @@ class UserStatus(models.Model):
         payload = get_token_payload(
             token, TokenAction.ACTIVATION, app_settings.EXPIRATION_ACTIVATION_TOKEN
         )
-        user = UserModel._default_manager.get(**payload)
-        user_status = cls.objects.get(user=user)
+        user = users_with_status().get(**payload)
+        user_status = user.status
         if user_status.verified is False:
-            user_status.verified = True
-            user_status.save(update_fields=["verified"])
+            with transaction.atomic():
+                UsedToken.consume(token, app_settings.EXPIRATION_ACTIVATION_TOKEN)
+                user_status.verified = True
+                user_status.save(update_fields=["verified"])
             user_verified.send(sender=cls, user=user)
         else:
             raise UserAlreadyVerified
@@ -161,39 +473,366 @@ class UserStatus(models.Model):
         secondary_email = payload.pop("secondary_email")
         if not cls.email_is_free(secondary_email):
             raise EmailAlreadyInUse
-        user = UserModel._default_manager.get(**payload)
-        user_status = cls.objects.get(user=user)
-        user_status.secondary_email = secondary_email
-        user_status.save(update_fields=["secondary_email"])
+        user = users_with_status().get(**payload)
+        user_status = user.status
+        with transaction.atomic():
+            UsedToken.consume(
+                token, app_settings.EXPIRATION_SECONDARY_EMAIL_ACTIVATION_TOKEN
+            )
+            user_status.secondary_email = secondary_email
+            user_status.save(update_fields=["secondary_email"])
 
     @classmethod
     def unarchive(cls, user):
-        user_status = cls.objects.get(user=user)
+        user_status = cls.get_for_user(user)
         if user_status.archived is True:
             user_status.archived = False
             user_status.save(update_fields=["archived"])
 
     @classmethod
     def archive(cls, user):
-        user_status = cls.objects.get(user=user)
+        user_status = cls.get_for_user(user)
         if user_status.archived is False:
             user_status.archived = True
             user_status.save(update_fields=["archived"])
 
+
+def _user_field(name):
+    return property(
+        lambda status: getattr(status.user, name),
+        lambda status, value: setattr(status.user, name, value),
+    )
+
+
+class InlineUserStatus(BaseUserStatus):
+    """
+    `user.status` of the user models with `AbstractUserStatusMixin`.
+
+    Reads and saves the status fields of the user row.
+    """
+
+    verified = _user_field("verified")
+    archived = _user_field("archived")
+    secondary_email = _user_field("secondary_email")
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def pk(self):
+        return self.user.pk
+
+    def save(self, update_fields=None):
+        self.user.save(update_fields=update_fields)
+
+    def refresh_from_db(self, fields=None):
+        self.user.refresh_from_db(fields=fields)
+
     def swap_emails(self):
         if not self.secondary_email:
             raise WrongUsage
+        EMAIL_FIELD = UserModel.EMAIL_FIELD
+        primary = getattr(self.user, EMAIL_FIELD)
+        setattr(self.user, EMAIL_FIELD, self.secondary_email)
+        self.secondary_email = primary
+        # both emails are on the same row, one update is enough
+        self.save(update_fields=[EMAIL_FIELD, "secondary_email"])
+
+
+if STATUS_ON_USER:
+    # the reverse accessor of UserStatus.user hides the mixin property
+    UserModel.status = AbstractUserStatusMixin.status
+
+
+class EmailAddress(models.Model):
+    """
+    Primary and secondary emails of every user, when
+    `EMAIL_ADDRESS_TABLE` is on.
+
+    Kept in sync by signals when a user or `UserStatus` is saved.
+    The unique `normalized` column makes every email lookup a single
+    indexed query, and lets the database refuse the same email for
+    two users, even under concurrent registrations.
+
+    Changes made with `QuerySet.update` don't send signals, run the
+    `sync_email_addresses` command after them.
+    """
+
+    user = models.ForeignKey(
+        django_settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="email_addresses",
+    )
+    email = models.EmailField()
+    normalized = models.CharField(max_length=254, unique=True)
+    primary = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name_plural = "email addresses"
+
+    def __str__(self):
+        return self.email
+
+    @staticmethod
+    def normalize(email):
+        return email.strip().lower()
+
+    @classmethod
+    def sync(cls, user, status=None):
+        """
+        Make the rows of `user` match its primary and secondary emails.
+
+        Raise `EmailAlreadyInUse` if one of them belongs to other user.
+        """
+        if STATUS_ON_USER:
+            status = user.status
+        elif status is None:
+            status = UserStatus._default_manager.filter(user=user).first()
+        wanted = {}
+        for email, primary in (
+            (getattr(user, UserModel.EMAIL_FIELD), True),
+            (status and status.secondary_email, False),
+        ):
+            if email:
+                wanted.setdefault(cls.normalize(email), (email, primary))
+
         with transaction.atomic():
-            EMAIL_FIELD = UserModel.EMAIL_FIELD
-            primary = getattr(self.user, EMAIL_FIELD)
-            setattr(self.user, EMAIL_FIELD, self.secondary_email)
-            self.secondary_email = primary
-            self.user.save(update_fields=[EMAIL_FIELD])
-            self.save(update_fields=["secondary_email"])
+            existing = {
+                address.normalized: address
+                for address in cls._default_manager.filter(user=user)
+            }
+            stale = [a.pk for key, a in existing.items() if key not in wanted]
+            if stale:
+                cls._default_manager.filter(pk__in=stale).delete()
+            for normalized, (email, primary) in wanted.items():
+                address = existing.get(normalized)
+                if address is None:
+                    cls._create(user, email, normalized, primary)
+                elif (address.email, address.primary) != (email, primary):
+                    address.email, address.primary = email, primary
+                    address.save(update_fields=["email", "primary"])
 
-    def remove_secondary_email(self):
-        if not self.secondary_email:
-            raise WrongUsage
+    @classmethod
+    def _create(cls, user, email, normalized, primary):
+        try:
+            with transaction.atomic():
+                cls._default_manager.create(
+                    user=user, email=email, normalized=normalized, primary=primary
+                )
+        except IntegrityError:
+            raise EmailAlreadyInUse
+
+    @classmethod
+    def get_user(cls, email):
+        """
+        Return the user with `email` as primary or secondary email,
+        and whether it is the primary one.
+        Raise `EmailAddress.DoesNotExist`.
+        """
+        address = cls._default_manager.select_related("user").get(
+            normalized=cls.normalize(email)
+        )
+        return address.user, address.primary
+
+
+class EmailOutbox(models.Model):
+    """
+    Emails waiting to be delivered.
+
+    When `EMAIL_OUTBOX` is on, `UserStatus.send` writes here instead
+    of talking to the mail server, so the row is committed (or rolled
+    back) together with the mutation that created it.
+
+    The `send_outbox_emails` command delivers the pending rows in batches.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = ((PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed"))
+
+    subject = models.TextField()
+    message = models.TextField()
+    html_message = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    # newline separated list of recipients
+    recipients = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return "%s - %s" % (self.recipients.replace("\n", ", "), self.status)
+
+    @property
+    def recipient_list(self):
+        return self.recipients.split("\n")
+
+    @classmethod
+    def enqueue(cls, subject, message, html_message, recipient_list, from_email=None):
+        return cls._default_manager.create(
+            subject=subject,
+            message=message,
+            html_message=html_message or "",
+            from_email=from_email or app_settings.EMAIL_FROM,
+            recipients="\n".join(recipient_list),
+        )
+
+    def as_message(self, connection=None):
+        email = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.message,
+            from_email=self.from_email,
+            to=self.recipient_list,
+            connection=connection,
+        )
+        if self.html_message:
+            email.attach_alternative(self.html_message, "text/html")
+        return email
+
+    def deliver(self, connection=None):
+        """
+        Try to send the email once and record the outcome.
+
+        Failures are retried with an exponential backoff, starting
+        from `EMAIL_OUTBOX_RETRY_DELAY`, until `EMAIL_OUTBOX_MAX_ATTEMPTS`.
+        """
+        self.attempt(connection)
+        self.save_attempt()
+        return self.status == self.SENT
+
+    def attempt(self, connection=None):
+        """
+        Try to send the email once, set the outcome without saving it.
+        """
+        self.attempts += 1
+        try:
+            self.as_message(connection).send(fail_silently=False)
+        except Exception as e:
+            self.last_error = repr(e)
+            if self.attempts >= app_settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                self.status = self.FAILED
+            else:
+                delay = app_settings.EMAIL_OUTBOX_RETRY_DELAY * (
+                    2 ** (self.attempts - 1)
+                )
+                self.next_attempt_at = timezone.now() + delay
+        else:
+            self.status = self.SENT
+            self.sent_at = timezone.now()
+            self.last_error = ""
+        return self.status == self.SENT
+
+    def save_attempt(self):
+        self.save(
+            update_fields=[
+                "attempts",
+                "status",
+                "next_attempt_at",
+                "last_error",
+                "sent_at",
+            ]
+        )
+
+    @classmethod
+    def process_batch(cls, batch_size=None):
+        """
+        Claim up to `batch_size` due emails and deliver them over a
+        single connection.
+
+        Rows are claimed in a short transaction, with `skip_locked`,
+        by moving their `next_attempt_at` forward by
+        `EMAIL_OUTBOX_LEASE`: several workers can run at the same time
+        without sending the same email twice, and the emails of a
+        worker that died are retried when the lease ends. The emails
+        are sent outside of any transaction, so a slow mail server
+        doesn't hold row locks, and the outcomes are saved together.
+
+        Return a tuple `(sent, failed)`.
+        """
+        batch_size = batch_size or app_settings.EMAIL_OUTBOX_BATCH_SIZE
+        sent = failed = 0
         with transaction.atomic():
-            self.secondary_email = None
-            self.save(update_fields=["secondary_email"])
+            now = timezone.now()
+            emails = list(
+                cls._default_manager.select_for_update(skip_locked=True)
+                .filter(status=cls.PENDING, next_attempt_at__lte=now)
+                .order_by("next_attempt_at")[:batch_size]
+            )
+            if not emails:
+                return sent, failed
+            cls._default_manager.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=now + app_settings.EMAIL_OUTBOX_LEASE
+            )
+
+        connection = get_connection(fail_silently=False)
+        try:
+            for email in emails:
+                if email.attempt(connection):
+                    sent += 1
+                else:
+                    failed += 1
+        finally:
+            connection.close()
+
+        with transaction.atomic():
+            for email in emails:
+                email.save_attempt()
+        return sent, failed
+
+
+class UsedToken(models.Model):
+    """
+    Tokens that were already used, when `SINGLE_USE_TOKENS` is on.
+
+    Only the sha256 of the token is stored. Rows are useless once the
+    token has expired, the `purge_used_tokens` command deletes them.
+    """
+
+    digest = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.digest
+
+    @classmethod
+    def consume(cls, token, exp):
+        """
+        Record `token` as used, raise `TokenAlreadyUsed` if it already was.
+
+        `exp` is the token expiration, after it the row can be purged.
+        """
+        if not app_settings.SINGLE_USE_TOKENS:
+            return
+        try:
+            # savepoint, so the caller's transaction survives the error
+            with transaction.atomic():
+                cls._default_manager.create(
+                    digest=get_token_digest(token), expires_at=timezone.now() + exp
+                )
+        except IntegrityError:
+            raise TokenAlreadyUsed
+
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """
+        Delete the expired rows, `batch_size` at a time so the
+        table is not locked for long. Return the number of deleted rows.
+        """
+        deleted = 0
+        now = timezone.now()
+        while True:
+            pks = list(
+                cls._default_manager.filter(expires_at__lt=now).values_list(
+                    "pk", flat=True
+                )[:batch_size]
+            )
+            if not pks:
+                return deleted
+            deleted += cls._default_manager.filter(pk__in=pks).delete()[0]
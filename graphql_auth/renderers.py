@@ -0,0 +1,244 @@
+"""
+Email template renderers.
+
+A renderer compiles each template once per process and renders
+the following emails from the compiled form.
+
+The renderer is chosen with the `EMAIL_TEMPLATE_RENDERER` setting.
+"""
+
+import os
+import re
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.conf import settings as django_settings
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.template.utils import get_app_template_dirs
+from django.test.signals import setting_changed
+from django.utils.html import conditional_escape, strip_tags
+from django.utils.module_loading import import_string
+
+from .settings import graphql_auth_settings as app_settings
+
+
+def get_template_dirs():
+    """
+    The `DIRS` of the `TEMPLATES` setting, followed by
+    the `templates` folder of each installed app.
+    """
+    dirs = []
+    for backend in django_settings.TEMPLATES:
+        dirs.extend(backend.get("DIRS", []))
+    dirs.extend(get_app_template_dirs("templates"))
+    return [str(d) for d in dirs]
+
+
+def load_template_source(name):
+    for directory in get_template_dirs():
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+    raise TemplateDoesNotExist(name)
+
+
+class BaseRenderer(object):
+    """
+    Keep the compiled templates in memory.
+
+    Subclasses implement `get_source`, `compile_string`
+    and `render_compiled`.
+    """
+
+    # the HTML of parent and included templates is only known after rendering
+    composition_re = re.compile(r"{%-?\s*(extends|include|import|from)\b")
+
+    def __init__(self):
+        self._templates = {}
+        self._text_templates = {}
+
+    def get_source(self, name):
+        raise NotImplementedError
+
+    def compile_string(self, source):
+        raise NotImplementedError
+
+    def render_compiled(self, template, context):
+        raise NotImplementedError
+
+    def compile(self, name):
+        return self.compile_string(self.get_source(name))
+
+    def compile_text(self, name):
+        """
+        Compile a text version of an HTML template, with the tags
+        stripped from the source instead of from each rendered email.
+
+        Return `None` for templates that extend or include others,
+        their rendered HTML is stripped instead.
+        """
+        source = self.get_source(name)
+        if self.composition_re.search(source):
+            return None
+        return self.compile_string(strip_tags(source))
+
+    def get_template(self, name):
+        try:
+            return self._templates[name]
+        except KeyError:
+            template = self._templates[name] = self.compile(name)
+            return template
+
+    def get_text_template(self, name):
+        try:
+            return self._text_templates[name]
+        except KeyError:
+            template = self._text_templates[name] = self.compile_text(name)
+            return template
+
+    def render(self, name, context):
+        return self.render_compiled(self.get_template(name), context)
+
+    def render_text(self, name, context):
+        template = self.get_text_template(name)
+        if template is None:
+            return strip_tags(self.render(name, context))
+        return self.render_compiled(template, context)
+
+    def clear(self):
+        self._templates = {}
+        self._text_templates = {}
+
+
+class DjangoTemplateRenderer(BaseRenderer):
+    """
+    Render with the Django template engine, same as `render_to_string`.
+    """
+
+    def compile(self, name):
+        return get_template(name)
+
+    def compile_text(self, name):
+        template = self.get_template(name)
+        source = template.template.source
+        if self.composition_re.search(source):
+            return None
+        # compile on the same backend the template was found
+        return template.backend.from_string(strip_tags(source))
+
+    def render_compiled(self, template, context):
+        return template.render(context)
+
+
+class Jinja2Renderer(BaseRenderer):
+    """
+    Render with Jinja2, loading the templates from the same
+    folders as Django. Requires `jinja2` to be installed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import jinja2
+        except ImportError:
+            raise ImproperlyConfigured(
+                "Jinja2Renderer requires Jinja2, install it with `pip install jinja2`."
+            )
+        self.environment = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(get_template_dirs()), autoescape=True
+        )
+
+    def get_source(self, name):
+        return self.environment.loader.get_source(self.environment, name)[0]
+
+    def compile(self, name):
+        return self.environment.get_template(name)
+
+    def compile_string(self, source):
+        return self.environment.from_string(source)
+
+    def render_compiled(self, template, context):
+        return template.render(context)
+
+
+class SimpleRenderer(BaseRenderer):
+    """
+    Minimal placeholder substitution.
+
+    Only supports variables, like `{{ user.username }}`; no tags
+    or filters. The template is split once into literal and
+    variable parts, so rendering is a single join.
+
+    Values are escaped and callables are called, as with the
+    Django engine, except those with `alters_data` or
+    `do_not_call_in_templates`.
+    """
+
+    variable_re = re.compile(r"{{\s*([\w.]+)\s*}}")
+
+    def get_source(self, name):
+        return load_template_source(name)
+
+    def compile_string(self, source):
+        parts = self.variable_re.split(source)
+        # after the split, odd positions hold the variable paths
+        return [
+            part if i % 2 == 0 else tuple(part.split("."))
+            for i, part in enumerate(parts)
+        ]
+
+    def resolve(self, path, context):
+        value = context
+        for bit in path:
+            try:
+                value = value[bit]
+            except (TypeError, KeyError, IndexError):
+                try:
+                    value = getattr(value, bit)
+                except AttributeError:
+                    return ""
+            # the rules of the Django engine: no call to methods
+            # that change data, like user.delete
+            if callable(value):
+                if getattr(value, "do_not_call_in_templates", False):
+                    pass
+                elif getattr(value, "alters_data", False):
+                    return ""
+                else:
+                    value = value()
+        return "" if value is None else value
+
+    def render_compiled(self, template, context):
+        return "".join(
+            part
+            if isinstance(part, str)
+            else conditional_escape(self.resolve(part, context))
+            for part in template
+        )
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """
+    Return the process wide instance of `EMAIL_TEMPLATE_RENDERER`.
+    """
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = import_string(app_settings.EMAIL_TEMPLATE_RENDERER)()
+    return _renderer
+
+
+def reset_renderer(*args, **kwargs):
+    global _renderer
+    if kwargs["setting"] in ("GRAPHQL_AUTH", "TEMPLATES", "INSTALLED_APPS"):
+        _renderer = None
+
+
+setting_changed.connect(reset_renderer)
@@ -4,13 +4,21 @@ import graphene
 from graphene_django.filter.fields import DjangoFilterConnectionField
 from graphene_django.types import DjangoObjectType
 
+from .models import STATUS_ON_USER, status_lookup
 from .settings import graphql_auth_settings as app_settings
 
 
+def get_filter_fields():
+    fields = app_settings.USER_NODE_FILTER_FIELDS
+    if isinstance(fields, dict):
+        return {status_lookup(field): value for field, value in fields.items()}
+    return [status_lookup(field) for field in fields]
+
+
 class UserNode(DjangoObjectType):
     class Meta:
         model = get_user_model()
-        filter_fields = app_settings.USER_NODE_FILTER_FIELDS
+        filter_fields = get_filter_fields()
         exclude = app_settings.USER_NODE_EXCLUDE_FIELDS
         interfaces = (graphene.relay.Node,)
         skip_registry = True
@@ -34,6 +42,8 @@ class UserNode(DjangoObjectType):
 
     @classmethod
     def get_queryset(cls, queryset, info):
+        if STATUS_ON_USER:
+            return queryset
         return queryset.select_related("status")
 
 
@@ -35,9 +35,32 @@ DEFAULTS = {
     "EXPIRATION_PASSWORD_RESET_TOKEN": timedelta(hours=1),
     "EXPIRATION_SECONDARY_EMAIL_ACTIVATION_TOKEN": timedelta(hours=1),
     "EXPIRATION_PASSWORD_SET_TOKEN": timedelta(hours=1),
+    # "signing" (django.core.signing) or "compact" (graphql_auth.tokens),
+    # both are accepted when verifying
+    "TOKEN_FORMAT": "signing",
+    # identify the user by pk instead of USERNAME_FIELD
+    # on "signing" tokens ("compact" ones always use the pk)
+    "TOKEN_PAYLOAD_PK": False,
+    # old SECRET_KEYs, tokens signed with them are still valid
+    "TOKEN_FALLBACK_KEYS": [],
+    # record used tokens (UsedToken) and refuse them the second time
+    "SINGLE_USE_TOKENS": False,
+    # e.g. timedelta(minutes=5), cache the errors of the verify
+    # and password reset mutations per token
+    "TOKEN_RESULT_CACHE_TIMEOUT": None,
+    # compare emails ignoring the case (LOWER(email) = lower(value))
+    "CASE_INSENSITIVE_EMAIL": False,
+    # keep primary and secondary emails in the EmailAddress table
+    # and use it for every email lookup
+    "EMAIL_ADDRESS_TABLE": False,
+    # cache used by graphql_auth, any django cache alias
+    "CACHE_ALIAS": "default",
     # email stuff
     "EMAIL_FROM": getattr(django_settings, "DEFAULT_FROM_EMAIL", "test@email.com"),
     "SEND_ACTIVATION_EMAIL": True,
+    # e.g. "https://example.com", used to build the email context
+    # instead of the request and the sites framework
+    "EMAIL_BASE_URL": None,
     # client: example.com/activate/token
     "ACTIVATION_PATH_ON_EMAIL": "activate",
     "ACTIVATION_SECONDARY_EMAIL_PATH_ON_EMAIL": "activate",
@@ -57,7 +80,16 @@ DEFAULTS = {
     "EMAIL_TEMPLATE_SECONDARY_EMAIL_ACTIVATION": "email/activation_email.html",
     "EMAIL_TEMPLATE_PASSWORD_SET": "email/password_set_email.html",
     "EMAIL_TEMPLATE_PASSWORD_RESET": "email/password_reset_email.html",
+    # plain text templates, by default the text is the html template
+    # with the tags stripped, done once when the template is loaded
+    "EMAIL_TEMPLATE_ACTIVATION_TXT": None,
+    "EMAIL_TEMPLATE_ACTIVATION_RESEND_TXT": None,
+    "EMAIL_TEMPLATE_SECONDARY_EMAIL_ACTIVATION_TXT": None,
+    "EMAIL_TEMPLATE_PASSWORD_SET_TXT": None,
+    "EMAIL_TEMPLATE_PASSWORD_RESET_TXT": None,
     "EMAIL_TEMPLATE_VARIABLES": {},
+    # templates are compiled once per process by the renderer
+    "EMAIL_TEMPLATE_RENDERER": "graphql_auth.renderers.DjangoTemplateRenderer",
     # query stuff
     "USER_NODE_EXCLUDE_FIELDS": ["password", "is_superuser"],
     "USER_NODE_FILTER_FIELDS": {
@@ -72,6 +104,41 @@ DEFAULTS = {
     "ALLOW_DELETE_ACCOUNT": False,
     # string path for email function wrapper, see the testproject example
     "EMAIL_ASYNC_TASK": False,
+    # give EMAIL_ASYNC_TASK a picklable function and task instead
+    # of the bound method and the request
+    "EMAIL_ASYNC_TASK_SERIALIZABLE": False,
+    # used by graphql_auth.executors.thread_pool_email_task,
+    # when the queue is full "block" waits and "shed" drops the email
+    "EMAIL_THREAD_POOL_WORKERS": 2,
+    "EMAIL_THREAD_POOL_QUEUE_SIZE": 100,
+    "EMAIL_THREAD_POOL_FULL_POLICY": "block",
+    # inside a transaction, wait for the commit to send emails
+    "EMAIL_SEND_ON_COMMIT": False,
+    # write emails to the EmailOutbox table instead of sending them,
+    # deliver them with the send_outbox_emails command
+    "EMAIL_OUTBOX": False,
+    "EMAIL_OUTBOX_BATCH_SIZE": 100,
+    "EMAIL_OUTBOX_MAX_ATTEMPTS": 5,
+    "EMAIL_OUTBOX_RETRY_DELAY": timedelta(minutes=1),
+    # claimed emails are not picked by other workers for this long
+    "EMAIL_OUTBOX_LEASE": timedelta(minutes=10),
+    # reuse open smtp connections between emails
+    "EMAIL_CONNECTION_POOL": False,
+    "EMAIL_CONNECTION_POOL_SIZE": 4,
+    "EMAIL_CONNECTION_POOL_IDLE_TIMEOUT": timedelta(seconds=60),
+    # after EMAIL_CIRCUIT_BREAKER_FAILURE_THRESHOLD consecutive failures,
+    # fail fast (email_fail) or use the outbox, until the recovery timeout
+    "EMAIL_CIRCUIT_BREAKER": False,
+    "EMAIL_CIRCUIT_BREAKER_TIMEOUT": timedelta(seconds=10),
+    "EMAIL_CIRCUIT_BREAKER_FAILURE_THRESHOLD": 5,
+    "EMAIL_CIRCUIT_BREAKER_RECOVERY_TIMEOUT": timedelta(seconds=30),
+    "EMAIL_CIRCUIT_BREAKER_OUTBOX_FALLBACK": False,
+    # send emails with aiosmtplib on the async methods (UserStatus.asend...),
+    # instead of running the blocking send on a thread
+    "EMAIL_ASYNC_SMTP_CLIENT": False,
+    # ignore repeated activation and password reset requests
+    # for the same user inside this window
+    "EMAIL_COOLDOWN": None,
     # mutation error type
     "CUSTOM_ERROR_TYPE": None,
     # registration with no password
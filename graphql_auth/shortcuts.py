@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 
-from .models import UserStatus
+from .models import EmailAddress, UserStatus
 from .settings import graphql_auth_settings as app_settings
+from .utils import filter_email
 
 
 UserModel = get_user_model()
@@ -13,12 +14,15 @@ def get_user_by_email(email):
     get user by email or by secondary email
     raise ObjectDoesNotExist
     """
-    try:
-        user = UserModel._default_manager.get(**{UserModel.EMAIL_FIELD: email})
+    if app_settings.EMAIL_ADDRESS_TABLE:
+        user, primary = EmailAddress.get_user(email)
         return user
+    try:
+        return filter_email(
+            UserModel._default_manager, UserModel.EMAIL_FIELD, email
+        ).get()
     except ObjectDoesNotExist:
-        status = UserStatus._default_manager.get(secondary_email=email)
-        return status.user
+        return UserStatus.get_user_by_secondary_email(email)
 
 
 def get_user_to_login(**kwargs):
@@ -27,13 +31,20 @@ def get_user_to_login(**kwargs):
     to perform login
     raise ObjectDoesNotExist
     """
+    email_field = UserModel.EMAIL_FIELD
+    email = kwargs.get(email_field, None)
+    if app_settings.EMAIL_ADDRESS_TABLE and email and len(kwargs) == 1:
+        user, primary = EmailAddress.get_user(email)
+        if primary or app_settings.ALLOW_LOGIN_WITH_SECONDARY_EMAIL:
+            return user
+        raise ObjectDoesNotExist
     try:
-        user = UserModel._default_manager.get(**kwargs)
-        return user
+        users = UserModel._default_manager.all()
+        if email:
+            kwargs = kwargs.copy()
+            users = filter_email(users, email_field, kwargs.pop(email_field))
+        return users.get(**kwargs)
     except ObjectDoesNotExist:
-        if app_settings.ALLOW_LOGIN_WITH_SECONDARY_EMAIL:
-            email = kwargs.get(UserModel.EMAIL_FIELD, None)
-            if email:
-                status = UserStatus._default_manager.get(secondary_email=email)
-                return status.user
+        if app_settings.ALLOW_LOGIN_WITH_SECONDARY_EMAIL and email:
+            return UserStatus.get_user_by_secondary_email(email)
         raise ObjectDoesNotExist
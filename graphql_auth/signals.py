@@ -1,16 +1,63 @@
-from django.db.models.signals import post_save
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
 from django.conf import settings as django_settings
 
 from django.dispatch import Signal, receiver
 
+from .settings import graphql_auth_settings as app_settings
+
 
 @receiver(post_save, sender=django_settings.AUTH_USER_MODEL)
 def create_user_status(sender, instance, created, **kwargs):
-    if created:
-        from .models import UserStatus
+    from .models import STATUS_ON_USER, UserStatus
 
+    if not created or STATUS_ON_USER:
+        return
+    status = UserStatus.user.field.remote_field.get_cached_value(instance, None)
+    if status is not None and status.pk is None:
+        # see UserStatus.attach. Attached before the user had a pk,
+        # which Django < 3.0 doesn't copy from the user on save
+        status.user = instance
+        status.save(force_insert=True)
+    else:
         UserStatus._default_manager.get_or_create(user=instance)
 
 
+@receiver(post_save, sender=django_settings.AUTH_USER_MODEL)
+def sync_user_email_addresses(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    from .models import STATUS_ON_USER, EmailAddress, UserModel
+
+    if not app_settings.EMAIL_ADDRESS_TABLE or raw:
+        return
+    email_fields = {UserModel.EMAIL_FIELD}
+    if STATUS_ON_USER:
+        email_fields.add("secondary_email")
+    if update_fields is not None and not email_fields.intersection(update_fields):
+        return
+    EmailAddress.sync(instance, getattr(instance, "status", None))
+
+
+@receiver(post_save, sender="graphql_auth.UserStatus")
+def sync_status_email_addresses(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    from .models import EmailAddress
+
+    if not app_settings.EMAIL_ADDRESS_TABLE or raw:
+        return
+    if update_fields is not None and "secondary_email" not in update_fields:
+        return
+    EmailAddress.sync(instance.user, instance)
+
+
+if apps.is_installed("django.contrib.sites"):
+    from .utils import clear_url_contexts
+
+    post_save.connect(clear_url_contexts, sender="sites.Site")
+    post_delete.connect(clear_url_contexts, sender="sites.Site")
+
+
 user_registered = Signal()
 user_verified = Signal()
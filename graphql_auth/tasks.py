@@ -0,0 +1,43 @@
+"""
+Serializable email tasks.
+
+An `EmailTask` only holds plain data, so unlike the bound methods
+given to `EMAIL_ASYNC_TASK` by default, it can be pickled or
+converted to JSON and sent to a process pool or a task queue.
+"""
+
+from collections import namedtuple
+
+EmailTask = namedtuple(
+    "EmailTask",
+    [
+        "user_pk",
+        "action",
+        "path",
+        "subject",
+        "template",
+        "text_template",
+        "recipient_list",
+        # site_name, domain, protocol and port, see utils.get_url_context
+        "url_context",
+        # extra token payload, e.g. the secondary email
+        "token_kwargs",
+    ],
+)
+
+
+def run_email_task(task):
+    """
+    Send the email described by the task.
+
+    Also accepts the task converted to a dict or a list,
+    e.g. after a JSON round trip.
+    """
+    from .models import users_with_status
+
+    if isinstance(task, dict):
+        task = EmailTask(**task)
+    elif not isinstance(task, EmailTask):
+        task = EmailTask(*task)
+    user = users_with_status().get(pk=task.user_pk)
+    return user.status.send_email_task(task)
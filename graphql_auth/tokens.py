@@ -0,0 +1,262 @@
+"""
+Token signing.
+
+Signers are built once per token action, with a per action salt, and
+reused: the HMAC key is derived on creation instead of on every call
+like `django.core.signing.dumps` does. They sign with `SECRET_KEY` and
+also accept `TOKEN_FALLBACK_KEYS`, to rotate the secret key without
+invalidating the links already sent.
+
+Compact token format, enabled with `TOKEN_FORMAT = "compact"`.
+
+A token is the urlsafe base64 (no padding) of:
+
+    version | action | pk | timestamp | extra fields | truncated hmac
+
+`action` is one byte, `pk`, `timestamp` and the lengths are varints
+and every extra field is a length prefixed utf-8 key and value.
+The alphabet has no ":", which tells compact tokens apart from
+`django.core.signing` ones.
+"""
+import base64
+import hashlib
+import hmac
+import time
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.signing import (
+    BadSignature,
+    JSONSerializer,
+    SignatureExpired,
+    TimestampSigner,
+    b64_decode,
+    b64_encode,
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes
+from django.test.signals import setting_changed
+
+from .constants import TokenAction
+from .settings import graphql_auth_settings as app_settings
+
+VERSION = 1
+MAC_SIZE = 12
+# salt of django.core.signing.dumps, used by the tokens
+# created before the per action signers
+LEGACY_SALT = "django.core.signing"
+
+ACTION_CODES = {
+    TokenAction.ACTIVATION: 1,
+    TokenAction.PASSWORD_RESET: 2,
+    TokenAction.ACTIVATION_SECONDARY_EMAIL: 3,
+    TokenAction.PASSWORD_SET: 4,
+}
+ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+
+class CachedTimestampSigner(TimestampSigner):
+    """
+    `TimestampSigner` that derives its HMAC key once.
+
+    Signatures are the same as `TimestampSigner`'s, with the signer's
+    `algorithm`: sha256 from Django 3.1, sha1 before.
+    """
+
+    # Django < 3.1 signers have no algorithm and sign with sha1
+    algorithm = "sha1"
+
+    def __init__(self, key=None, salt=None, algorithm=None):
+        super().__init__(key=key, salt=salt)
+        if algorithm:
+            self.algorithm = algorithm
+        hasher = getattr(hashlib, self.algorithm)
+        key_salt = force_bytes(self.salt + "signer")
+        derived_key = hasher(key_salt + force_bytes(self.key)).digest()
+        self._hmac = hmac.new(derived_key, digestmod=hasher)
+
+    def hmac(self, value):
+        mac = self._hmac.copy()
+        mac.update(force_bytes(value))
+        return mac.digest()
+
+    def signature(self, value):
+        return b64_encode(self.hmac(value)).decode()
+
+
+class TokenSigner(object):
+    """
+    Sign with the first key, accept any of them.
+
+    Where the signers use another algorithm than sha1, the sha1
+    signatures of the tokens sent before upgrading Django are
+    accepted too.
+    """
+
+    def __init__(self, salt, keys):
+        self.signers = [CachedTimestampSigner(key, salt=salt) for key in keys]
+        self.signers += [
+            CachedTimestampSigner(signer.key, salt=salt, algorithm="sha1")
+            for signer in self.signers
+            if signer.algorithm != "sha1"
+        ]
+
+    def dumps(self, obj):
+        data = b64_encode(JSONSerializer().dumps(obj)).decode()
+        return self.signers[0].sign(data)
+
+    def loads(self, token, max_age=None):
+        for signer in self.signers:
+            try:
+                data = signer.unsign(token, max_age=max_age)
+            except SignatureExpired:
+                raise
+            except BadSignature:
+                continue
+            if data[:1] == ".":
+                raise BadSignature("Compressed tokens are not supported.")
+            return JSONSerializer().loads(b64_decode(data.encode()))
+        raise BadSignature("Signature does not match.")
+
+    def mac(self, data):
+        return self.signers[0].hmac(data)[:MAC_SIZE]
+
+    def check_mac(self, data, mac):
+        return any(
+            constant_time_compare(mac, signer.hmac(data)[:MAC_SIZE])
+            for signer in self.signers
+        )
+
+
+_signers = {}
+
+
+def _get_signer(salt):
+    try:
+        return _signers[salt]
+    except KeyError:
+        keys = [django_settings.SECRET_KEY] + list(app_settings.TOKEN_FALLBACK_KEYS)
+        signer = _signers[salt] = TokenSigner(salt, keys)
+        return signer
+
+
+def get_signer(action):
+    return _get_signer("graphql_auth.%s" % action)
+
+
+def get_legacy_signer():
+    return _get_signer(LEGACY_SALT)
+
+
+def clear_signers(*args, **kwargs):
+    _signers.clear()
+
+
+def _clear_signers(*, setting, **kwargs):
+    if setting in ("SECRET_KEY", "GRAPHQL_AUTH"):
+        clear_signers()
+
+
+setting_changed.connect(_clear_signers)
+
+
+def can_encode(pk, action, extra):
+    return (
+        isinstance(pk, int)
+        and pk >= 0
+        and action in ACTION_CODES
+        and all(isinstance(value, str) for value in extra.values())
+    )
+
+
+def is_compact(token):
+    return ":" not in token
+
+
+def _write_varint(buffer, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            buffer.append(byte | 0x80)
+        else:
+            buffer.append(byte)
+            return
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        try:
+            byte = data[offset]
+        except IndexError:
+            raise BadSignature("Truncated token.")
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _write_string(buffer, value):
+    value = value.encode()
+    _write_varint(buffer, len(value))
+    buffer.extend(value)
+
+
+def _read_string(data, offset):
+    length, offset = _read_varint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise BadSignature("Truncated token.")
+    return data[offset:end].decode(), end
+
+
+def dumps(pk, action, **extra):
+    buffer = bytearray((VERSION, ACTION_CODES[action]))
+    _write_varint(buffer, pk)
+    _write_varint(buffer, int(time.time()))
+    _write_varint(buffer, len(extra))
+    for key, value in extra.items():
+        _write_string(buffer, key)
+        _write_string(buffer, value)
+    buffer.extend(get_signer(action).mac(bytes(buffer)))
+    return base64.urlsafe_b64encode(bytes(buffer)).rstrip(b"=").decode()
+
+
+def loads(token, max_age=None):
+    """
+    Return `(action, payload)`, where payload is `{"pk": pk, **extra}`.
+
+    Raise `BadSignature` for tampered or malformed
+    tokens and `SignatureExpired` for old ones.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (TypeError, ValueError):
+        raise BadSignature("Malformed token.")
+    data, mac = data[:-MAC_SIZE], data[-MAC_SIZE:]
+    if len(data) < 2 or data[0] != VERSION or data[1] not in ACTIONS:
+        raise BadSignature("Unknown token version.")
+    action = ACTIONS[data[1]]
+    if not get_signer(action).check_mac(data, mac):
+        raise BadSignature("Signature does not match.")
+
+    pk, offset = _read_varint(data, 2)
+    timestamp, offset = _read_varint(data, offset)
+    if max_age is not None:
+        if isinstance(max_age, timedelta):
+            max_age = max_age.total_seconds()
+        age = time.time() - timestamp
+        if age > max_age:
+            raise SignatureExpired("Token age %s > %s seconds" % (age, max_age))
+
+    payload = {"pk": pk}
+    count, offset = _read_varint(data, offset)
+    try:
+        for _ in range(count):
+            key, offset = _read_string(data, offset)
+            payload[key], offset = _read_string(data, offset)
+    except UnicodeDecodeError:
+        raise BadSignature("Malformed token.")
+    return action, payload
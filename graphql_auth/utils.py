@@ -1,10 +1,19 @@
+import hashlib
 import warnings
-from django.core import signing
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.core.cache import caches
+from django.contrib.sites.shortcuts import get_current_site
 from django.contrib.auth import get_user_model
 from django.conf import settings as django_settings
-from django.core.signing import BadSignature
+from django.db.models import QuerySet
+from django.db.models.functions import Lower
+from django.core.signing import BadSignature, SignatureExpired
 
+from . import tokens
 from .exceptions import TokenScopeError
+from .settings import graphql_auth_settings as app_settings
 
 warnings.simplefilter("once")
 
@@ -13,16 +22,49 @@ def get_token(user, action, **kwargs):
     username = user.get_username()
     if hasattr(username, "pk"):
         username = username.pk
-    payload = {user.USERNAME_FIELD: username, "action": action}
+    return _make_token(user.pk, username, action, kwargs)
+
+
+def get_tokens(users, action, **kwargs):
+    """
+    Yield `(pk, token)` for each user, lazily.
+
+    `users` is a queryset, of which only the pk and `USERNAME_FIELD`
+    columns are fetched, or an iterable of `(pk, username)` tuples.
+    """
+    if isinstance(users, QuerySet):
+        username_field = users.model.USERNAME_FIELD
+        users = users.values_list("pk", username_field).iterator()
+    for pk, username in users:
+        yield pk, _make_token(pk, username, action, kwargs)
+
+
+def _make_token(pk, username, action, kwargs):
+    if app_settings.TOKEN_FORMAT == "compact" and tokens.can_encode(pk, action, kwargs):
+        return tokens.dumps(pk, action, **kwargs)
+    if app_settings.TOKEN_PAYLOAD_PK:
+        payload = {"pk": pk, "action": action}
+    else:
+        payload = {get_user_model().USERNAME_FIELD: username, "action": action}
     if kwargs:
         payload.update(**kwargs)
-    token = signing.dumps(payload)
-    return token
+    return tokens.get_signer(action).dumps(payload)
 
 
 def get_token_payload(token, action, exp=None):
-    payload = signing.loads(token, max_age=exp)
-    _action = payload.pop("action")
+    # signing tokens are always accepted, to not break
+    # the links sent before switching TOKEN_FORMAT
+    if tokens.is_compact(token):
+        _action, payload = tokens.loads(token, max_age=exp)
+    else:
+        try:
+            payload = tokens.get_signer(action).loads(token, max_age=exp)
+        except SignatureExpired:
+            raise
+        except BadSignature:
+            # created with signing.dumps, before the per action salts
+            payload = tokens.get_legacy_signer().loads(token, max_age=exp)
+        _action = payload.pop("action")
     if _action != action:
         raise TokenScopeError
     return payload
@@ -37,6 +79,145 @@ def get_token_paylod(token, action, exp=None):
     return get_token_payload(token, action, exp)
 
 
+def get_cache():
+    return caches[app_settings.CACHE_ALIAS]
+
+
+def get_token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_token_error_key(token, action):
+    return "graphql_auth:token_error:%s:%s" % (action, get_token_digest(token))
+
+
+def get_cached_token_error(token, action):
+    """
+    Return the name of the `Messages` error cached for `token`
+    submitted for `action`, if any.
+    """
+    if not app_settings.TOKEN_RESULT_CACHE_TIMEOUT:
+        return None
+    return get_cache().get(get_token_error_key(token, action))
+
+
+def cache_token_error(token, action, error):
+    """
+    Remember that `token` submitted for `action` gets the `Messages`
+    error named `error`, for `TOKEN_RESULT_CACHE_TIMEOUT`, so the next
+    submissions are answered without checking the signature or querying
+    the database.
+
+    The same token can get another answer from the mutation of
+    another action.
+    """
+    timeout = app_settings.TOKEN_RESULT_CACHE_TIMEOUT
+    if not timeout:
+        return
+    get_cache().set(get_token_error_key(token, action), error, timeout.total_seconds())
+
+
+@contextmanager
+def email_cooldown(user, action):
+    """
+    Yield False if an email for `action` was sent to `user`
+    less than `EMAIL_COOLDOWN` ago, otherwise start the cooldown
+    and yield True.
+
+    If the block raises, the cooldown is cancelled so the
+    user can try again.
+    """
+    if not app_settings.EMAIL_COOLDOWN:
+        yield True
+        return
+    cache = get_cache()
+    key = "graphql_auth:email_cooldown:%s:%s" % (action, user.pk)
+    # add is atomic, only the first request in the window gets True
+    if not cache.add(key, True, app_settings.EMAIL_COOLDOWN.total_seconds()):
+        yield False
+        return
+    try:
+        yield True
+    except Exception:
+        cache.delete(key)
+        raise
+
+
+_url_contexts = {}
+# the host comes from the request, don't let it grow forever
+URL_CONTEXTS_MAX_SIZE = 128
+
+
+def get_url_context(request=None):
+    """
+    Return the site and url variables of the email context:
+    `site_name`, `domain`, `protocol` and `port`.
+
+    With `EMAIL_BASE_URL`, they come from the setting and no
+    request is needed. Otherwise they are built from the request
+    and cached per host, until a `Site` is saved or deleted.
+    """
+    base_url = app_settings.EMAIL_BASE_URL
+    if base_url:
+        key = base_url
+    else:
+        key = (request.get_host(), request.is_secure(), request.get_port())
+    try:
+        return _url_contexts[key]
+    except KeyError:
+        pass
+
+    if base_url:
+        url = urlsplit(base_url)
+        default_port = 443 if url.scheme == "https" else 80
+        context = {
+            "site_name": url.netloc,
+            "domain": url.netloc,
+            "protocol": url.scheme,
+            "port": str(url.port or default_port),
+        }
+    else:
+        site = get_current_site(request)
+        context = {
+            "site_name": site.name,
+            "domain": site.domain,
+            "protocol": "https" if request.is_secure() else "http",
+            "port": request.get_port(),
+        }
+    if len(_url_contexts) >= URL_CONTEXTS_MAX_SIZE:
+        _url_contexts.clear()
+    _url_contexts[key] = context
+    return context
+
+
+def clear_url_contexts(*args, **kwargs):
+    _url_contexts.clear()
+
+
+EMAIL_LOWER = "graphql_auth_email_lower"
+
+
+def normalize_email(email):
+    return email.lower() if app_settings.CASE_INSENSITIVE_EMAIL else email
+
+
+def email_lookup(queryset, field):
+    """
+    Return `(queryset, field)` to compare `field` with `normalize_email`
+    results. With `CASE_INSENSITIVE_EMAIL` the field is `LOWER(field)`,
+    which the functional indexes of the optional
+    `graphql_auth.contrib.indexes` app serve.
+    """
+    if app_settings.CASE_INSENSITIVE_EMAIL:
+        return queryset.annotate(**{EMAIL_LOWER: Lower(field)}), EMAIL_LOWER
+    return queryset, field
+
+
+def filter_email(queryset, field, email):
+    queryset, field = email_lookup(queryset, field)
+    return queryset.filter(**{field: normalize_email(email)})
+
+
 def using_refresh_tokens():
     if (
         hasattr(django_settings, "GRAPHQL_JWT")
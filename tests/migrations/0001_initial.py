@@ -120,5 +120,38 @@ class Migration(migrations.Migration):
             ],
             options={"unique_together": {("first_name", "last_name")}},
             managers=[("objects", django.contrib.auth.models.UserManager())],
-        )
+        ),
+        migrations.CreateModel(
+            name="StatusUser",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("password", models.CharField(max_length=128, verbose_name="password")),
+                (
+                    "last_login",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="last login"
+                    ),
+                ),
+                ("verified", models.BooleanField(default=False)),
+                ("archived", models.BooleanField(default=False)),
+                (
+                    "secondary_email",
+                    models.EmailField(blank=True, max_length=254, null=True),
+                ),
+                ("username", models.CharField(max_length=150, unique=True)),
+                ("email", models.EmailField(blank=True, max_length=254)),
+                ("first_name", models.CharField(blank=True, max_length=30)),
+                ("last_name", models.CharField(blank=True, max_length=150)),
+                ("is_active", models.BooleanField(default=True)),
+            ],
+            options={"abstract": False},
+        ),
     ]
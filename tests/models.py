@@ -1,6 +1,9 @@
+from django.contrib.auth.base_user import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from graphql_auth.abstract_models import AbstractUserStatusMixin
+
 
 class CustomUser(AbstractUser):
     """
@@ -12,3 +15,21 @@ class CustomUser(AbstractUser):
 
     class Meta:
         unique_together = ("first_name", "last_name")
+
+
+class StatusUser(AbstractUserStatusMixin, AbstractBaseUser):
+    """
+    this model is used to test:
+        - the status fields on the user row (see settings c)
+    """
+
+    username = models.CharField(max_length=150, unique=True)
+    email = models.EmailField(blank=True)
+    first_name = models.CharField(max_length=30, blank=True)
+    last_name = models.CharField(max_length=150, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    objects = BaseUserManager()
+
+    USERNAME_FIELD = "username"
+    EMAIL_FIELD = "email"
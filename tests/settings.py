@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     "graphql_jwt.refresh_token.apps.RefreshTokenConfig",
     "django_filters",
     "graphql_auth",
+    "graphql_auth.contrib.indexes",
 ]
 
 DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3"}}
@@ -0,0 +1,16 @@
+from .settings import *
+
+GRAPHQL_AUTH = {
+    "USER_NODE_FILTER_FIELDS": {
+        "email": ["exact"],
+        "username": ["exact", "icontains", "istartswith"],
+        "is_active": ["exact"],
+        "status__archived": ["exact"],
+        "status__verified": ["exact"],
+        "status__secondary_email": ["exact"],
+    }
+}
+
+INSTALLED_APPS += ["tests"]
+
+AUTH_USER_MODEL = "tests.StatusUser"
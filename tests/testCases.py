@@ -44,7 +44,7 @@ class TestBase(TestCase):
         user = get_user_model().objects.create(*args, **kwargs)
         user.set_password(password or self.default_password)
         user.save()
-        user_status = UserStatus._default_manager.get(user=user)
+        user_status = UserStatus.get_for_user(user)
         user_status.verified = verified
         user_status.archived = archived
         user_status.secondary_email = secondary_email
@@ -0,0 +1,117 @@
+import sys
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from graphql_auth.exceptions import EmailCircuitOpen, UserAlreadyVerified
+from graphql_auth.mail import close_connection_pool, sync_to_async
+from graphql_auth.models import EmailOutbox
+
+
+class AsyncEmailTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="foo", email="foo@email.com"
+        )
+        self.status = self.user.status
+        self.info = mock.MagicMock()
+        self.info.context.get_port.return_value = "80"
+        self.info.context.is_secure.return_value = False
+
+    def test_asend_activation_email(self):
+        async_to_sync(self.status.asend_activation_email)(self.info)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["foo@email.com"])
+
+    def test_asend_password_reset_email(self):
+        async_to_sync(self.status.asend_password_reset_email)(
+            self.info, ["other@email.com"]
+        )
+        self.assertEqual(mail.outbox[0].to, ["other@email.com"])
+
+    def test_asend_secondary_email_activation(self):
+        async_to_sync(self.status.asend_secondary_email_activation)(
+            self.info, "secondary@email.com"
+        )
+        self.assertEqual(mail.outbox[0].to, ["secondary@email.com"])
+
+    def test_aresend_activation_email_already_verified(self):
+        self.status.verified = True
+        self.status.save()
+        with self.assertRaises(UserAlreadyVerified):
+            async_to_sync(self.status.aresend_activation_email)(self.info)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @mock.patch("graphql_auth.models.app_settings.EMAIL_OUTBOX", True)
+    def test_asend_to_outbox(self):
+        async_to_sync(self.status.asend_password_set_email)(self.info)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    @mock.patch("graphql_auth.models.app_settings.EMAIL_OUTBOX", True)
+    def test_database_work_is_thread_sensitive(self):
+        # not the default before asgiref 3.3
+        with mock.patch(
+            "graphql_auth.models.sync_to_async", wraps=sync_to_async
+        ) as wrapper:
+            async_to_sync(self.status.asend_activation_email)(self.info)
+            async_to_sync(self.status.asend)(
+                "email/activation_subject.txt",
+                "email/activation_email.html",
+                {"user": self.user},
+                ["foo@email.com"],
+            )
+        self.assertEqual(wrapper.call_count, 4)
+        for _, kwargs in wrapper.call_args_list:
+            self.assertIs(kwargs["thread_sensitive"], True)
+
+    @override_settings(EMAIL_HOST="smtp.example.com", EMAIL_PORT=2525)
+    @mock.patch("graphql_auth.mail.app_settings.EMAIL_ASYNC_SMTP_CLIENT", True)
+    def test_aiosmtplib_client(self):
+        calls = []
+
+        async def send(*args, **kwargs):
+            calls.append((args, kwargs))
+
+        aiosmtplib = mock.MagicMock(send=send)
+        with mock.patch.dict(sys.modules, {"aiosmtplib": aiosmtplib}):
+            async_to_sync(self.status.asend_activation_email)(self.info)
+        self.assertEqual(len(mail.outbox), 0)
+        (message,), kwargs = calls[0]
+        self.assertEqual(kwargs["recipients"], ["foo@email.com"])
+        self.assertEqual(kwargs["hostname"], "smtp.example.com")
+        self.assertEqual(kwargs["port"], 2525)
+        self.assertEqual(message["To"], "foo@email.com")
+        self.assertTrue(message.is_multipart())
+
+    @mock.patch("graphql_auth.mail.app_settings.EMAIL_CIRCUIT_BREAKER", True)
+    @mock.patch("graphql_auth.mail.app_settings.EMAIL_ASYNC_SMTP_CLIENT", True)
+    @mock.patch(
+        "graphql_auth.mail.app_settings.EMAIL_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 1
+    )
+    def test_aiosmtplib_circuit_breaker(self):
+        async def send(*args, **kwargs):
+            raise ConnectionRefusedError
+
+        aiosmtplib = mock.MagicMock(send=send)
+        self.addCleanup(close_connection_pool)
+        with mock.patch.dict(sys.modules, {"aiosmtplib": aiosmtplib}):
+            with self.assertRaises(ConnectionRefusedError):
+                async_to_sync(self.status.asend_activation_email)(self.info)
+            with self.assertRaises(EmailCircuitOpen):
+                async_to_sync(self.status.asend_activation_email)(self.info)
+
+    @mock.patch(
+        "graphql_auth.models.app_settings.EMAIL_CIRCUIT_BREAKER_OUTBOX_FALLBACK", True
+    )
+    def test_asend_circuit_open_outbox_fallback(self):
+        with mock.patch(
+            "graphql_auth.models.asend_email", side_effect=EmailCircuitOpen
+        ):
+            async_to_sync(self.status.asend_activation_email)(self.info)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
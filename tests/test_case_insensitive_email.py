@@ -0,0 +1,77 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import Messages
+from graphql_auth.models import UserStatus
+from graphql_auth.shortcuts import get_user_by_email, get_user_to_login
+from graphql_auth.utils import filter_email
+
+
+class CaseInsensitiveEmailTestCase(DefaultTestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            "graphql_auth.utils.app_settings.CASE_INSENSITIVE_EMAIL", True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = self.register_user(
+            email="Foo@Email.com",
+            username="foo",
+            verified=True,
+            secondary_email="Foo2@Email.com",
+        )
+
+    def test_lookups(self):
+        self.assertEqual(get_user_by_email("foo@email.com"), self.user)
+        self.assertEqual(get_user_by_email("FOO2@EMAIL.COM"), self.user)
+        self.assertEqual(get_user_to_login(email="foo2@email.com"), self.user)
+        self.assertFalse(UserStatus.email_is_free("foo@email.com"))
+        self.assertFalse(UserStatus.email_is_free("foo2@email.com"))
+        self.assertEqual(
+            UserStatus.emails_in_use(["FOO@email.com", "foo2@email.com", "x@x.com"]),
+            {"FOO@email.com", "foo2@email.com"},
+        )
+
+    def test_register_other_case(self):
+        query = """
+        mutation {
+            register(
+                email: "foo@email.com",
+                username: "new_user",
+                password1: "akssdgfbwkc",
+                password2: "akssdgfbwkc"
+            )
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query)
+        self.assertEqual(executed["success"], False)
+        self.assertEqual(executed["errors"]["email"], Messages.EMAIL_IN_USE)
+
+    def test_login_other_case(self):
+        query = """
+        mutation {
+            tokenAuth(email: "FOO@email.com", password: "%s")
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query % self.default_password)
+        self.assertEqual(executed["success"], True)
+
+    # built by graphql_auth.contrib.indexes
+    @skipUnless(connection.vendor == "sqlite", "sqlite query plan")
+    def test_uses_functional_index(self):
+        users = filter_email(get_user_model().objects, "email", "foo@email.com")
+        self.assertIn("graphql_auth_user_email_lower", users.explain())
+        statuses = filter_email(UserStatus.objects, "secondary_email", "x@x.com")
+        self.assertIn("graphql_auth_secondary_email_lower", statuses.explain())
+
+    def test_disabled(self):
+        with mock.patch(
+            "graphql_auth.utils.app_settings.CASE_INSENSITIVE_EMAIL", False
+        ):
+            self.assertTrue(UserStatus.email_is_free("foo@email.com"))
+            self.assertFalse(UserStatus.email_is_free("Foo@Email.com"))
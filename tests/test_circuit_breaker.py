@@ -0,0 +1,137 @@
+from datetime import timedelta
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock
+
+from django.core import mail
+
+from graphql_auth.exceptions import EmailCircuitOpen
+from graphql_auth.mail import CircuitBreaker, close_connection_pool
+from graphql_auth.models import EmailOutbox
+
+from .testCases import DefaultTestCase
+
+
+class CircuitBreakerTestCase(DefaultTestCase):
+    def fail(self):
+        raise SMTPServerDisconnected
+
+    def test_open_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        for _ in range(2):
+            with self.assertRaises(SMTPServerDisconnected):
+                breaker.call(self.fail)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        func = mock.Mock()
+        with self.assertRaises(EmailCircuitOpen):
+            breaker.call(func)
+        func.assert_not_called()
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        with self.assertRaises(SMTPServerDisconnected):
+            breaker.call(self.fail)
+        breaker.call(lambda: None)
+        with self.assertRaises(SMTPServerDisconnected):
+            breaker.call(self.fail)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @mock.patch("graphql_auth.mail.time.monotonic")
+    def test_half_open_probe(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        with self.assertRaises(SMTPServerDisconnected):
+            breaker.call(self.fail)
+
+        monotonic.return_value = 131
+        # failed probe opens the circuit again
+        with self.assertRaises(SMTPServerDisconnected):
+            breaker.call(self.fail)
+        with self.assertRaises(EmailCircuitOpen):
+            breaker.call(lambda: None)
+
+        monotonic.return_value = 162
+        self.assertEqual(breaker.call(lambda: 1), 1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @mock.patch("graphql_auth.mail.time.monotonic")
+    def test_half_open_probe_other_error(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        with self.assertRaises(SMTPServerDisconnected):
+            breaker.call(self.fail)
+
+        monotonic.return_value = 131
+        with self.assertRaises(ValueError):
+            breaker.call(mock.Mock(side_effect=ValueError))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        # not stuck half open, the next call probes again
+        self.assertEqual(breaker.call(lambda: 1), 1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_refused_message_not_counted(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        refused = SMTPRecipientsRefused({"foo@email.com": (550, b"unknown")})
+        aiosmtplib_refused = type(
+            "SMTPRecipientRefused", (Exception,), {"__module__": "aiosmtplib.errors"}
+        )
+        for error in (refused, refused, aiosmtplib_refused()):
+            with self.assertRaises(type(error)):
+                breaker.call(mock.Mock(side_effect=error))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.failures, 0)
+
+    def test_aiosmtplib_errors_counted(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        response_error = type(
+            "SMTPResponseException", (Exception,), {"__module__": "aiosmtplib.errors"}
+        )
+        with self.assertRaises(response_error):
+            breaker.call(mock.Mock(side_effect=response_error))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+@mock.patch("graphql_auth.mail.app_settings.EMAIL_CIRCUIT_BREAKER", True)
+@mock.patch("graphql_auth.mail.app_settings.EMAIL_CIRCUIT_BREAKER_FAILURE_THRESHOLD", 1)
+@mock.patch(
+    "graphql_auth.mail.app_settings.EMAIL_CIRCUIT_BREAKER_RECOVERY_TIMEOUT",
+    timedelta(seconds=30),
+)
+class CircuitBreakerMutationTestCase(DefaultTestCase):
+    def setUp(self):
+        close_connection_pool()
+        self.addCleanup(close_connection_pool)
+        self.user = self.register_user(email="foo@email.com", username="foo")
+
+    def query(self):
+        return """
+        mutation {
+            resendActivationEmail(email: "foo@email.com") {
+                success, errors
+            }
+        }
+        """
+
+    def test_fail_fast(self):
+        with mock.patch(
+            "graphql_auth.mail.send_mail", side_effect=SMTPServerDisconnected
+        ) as send_mail:
+            executed = self.make_request(self.query())
+            self.assertEqual(executed["success"], False)
+            executed = self.make_request(self.query())
+            self.assertEqual(executed["success"], False)
+            self.assertTrue(executed["errors"]["nonFieldErrors"])
+        self.assertEqual(send_mail.call_count, 1)
+
+    @mock.patch(
+        "graphql_auth.models.app_settings.EMAIL_CIRCUIT_BREAKER_OUTBOX_FALLBACK", True
+    )
+    def test_outbox_fallback(self):
+        with mock.patch(
+            "graphql_auth.mail.send_mail", side_effect=SMTPServerDisconnected
+        ):
+            self.make_request(self.query())
+            executed = self.make_request(self.query())
+        self.assertEqual(executed["success"], True)
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.recipient_list, ["foo@email.com"])
+        self.assertEqual(len(mail.outbox), 0)
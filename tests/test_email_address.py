@@ -0,0 +1,100 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import Messages
+from graphql_auth.exceptions import EmailAlreadyInUse
+from graphql_auth.models import EmailAddress, UserStatus
+from graphql_auth.shortcuts import get_user_by_email, get_user_to_login
+
+
+class EmailAddressTestCase(DefaultTestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            "graphql_auth.models.app_settings.EMAIL_ADDRESS_TABLE", True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = self.register_user(
+            email="foo@email.com",
+            username="foo",
+            verified=True,
+            secondary_email="Foo2@email.com",
+        )
+
+    def addresses(self, user):
+        return set(
+            EmailAddress.objects.filter(user=user).values_list("normalized", "primary")
+        )
+
+    def test_synced_on_save(self):
+        self.assertEqual(
+            self.addresses(self.user),
+            {("foo@email.com", True), ("foo2@email.com", False)},
+        )
+        self.user.status.swap_emails()
+        self.assertEqual(
+            self.addresses(self.user),
+            {("foo2@email.com", True), ("foo@email.com", False)},
+        )
+        self.user.status.remove_secondary_email()
+        self.assertEqual(self.addresses(self.user), {("foo2@email.com", True)})
+
+    def test_lookups(self):
+        self.assertEqual(get_user_by_email("FOO2@email.com"), self.user)
+        self.assertEqual(get_user_to_login(email="foo2@email.com"), self.user)
+        self.assertFalse(UserStatus.email_is_free("Foo@Email.com"))
+        self.assertTrue(UserStatus.email_is_free("free@email.com"))
+        self.assertEqual(
+            UserStatus.emails_in_use(["FOO@email.com", "free@email.com"]),
+            {"FOO@email.com"},
+        )
+        with CaptureQueriesContext(connection) as queries:
+            get_user_by_email("foo@email.com")
+        self.assertEqual(len(queries), 1)
+
+    @mock.patch(
+        "graphql_auth.shortcuts.app_settings.ALLOW_LOGIN_WITH_SECONDARY_EMAIL", False
+    )
+    def test_login_with_secondary_not_allowed(self):
+        with self.assertRaises(ObjectDoesNotExist):
+            get_user_to_login(email="foo2@email.com")
+
+    def test_unique(self):
+        with self.assertRaises(EmailAddress.DoesNotExist):
+            get_user_by_email("bar@email.com")
+        with self.assertRaises(EmailAlreadyInUse):
+            self.register_user(email="FOO@email.com", username="bar")
+
+    def test_register_email_in_use(self):
+        query = """
+        mutation {
+            register(
+                email: "foo2@email.com",
+                username: "new_user",
+                password1: "akssdgfbwkc",
+                password2: "akssdgfbwkc"
+            )
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query)
+        self.assertEqual(executed["success"], False)
+        self.assertEqual(executed["errors"]["email"], Messages.EMAIL_IN_USE)
+        self.assertFalse(get_user_model().objects.filter(username="new_user").exists())
+
+    def test_sync_command(self):
+        EmailAddress.objects.all().delete()
+        out = StringIO()
+        call_command("sync_email_addresses", stdout=out)
+        self.assertIn("Synced 1 users, 0 conflicts.", out.getvalue())
+        self.assertEqual(
+            self.addresses(self.user),
+            {("foo@email.com", True), ("foo2@email.com", False)},
+        )
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import Messages
+
+
+@mock.patch("graphql_auth.utils.app_settings.EMAIL_COOLDOWN", timedelta(minutes=1))
+class EmailCooldownTestCase(DefaultTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.not_verified = self.register_user(
+            email="gaa@email.com", username="gaa", verified=False
+        )
+        self.verified = self.register_user(
+            email="bar@email.com", username="bar", verified=True
+        )
+
+    def resend_query(self, email):
+        return """
+        mutation {
+        resendActivationEmail(email: "%s")
+            { success, errors }
+        }
+        """ % (
+            email
+        )
+
+    def reset_query(self, email):
+        return """
+        mutation {
+        sendPasswordResetEmail(email: "%s")
+            { success, errors }
+        }
+        """ % (
+            email
+        )
+
+    def test_resend_activation_email_cooldown(self):
+        for _ in range(3):
+            executed = self.make_request(self.resend_query("gaa@email.com"))
+            self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_password_reset_email_cooldown(self):
+        for _ in range(3):
+            executed = self.make_request(self.reset_query("bar@email.com"))
+            self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_cooldown_per_action(self):
+        self.make_request(self.resend_query("gaa@email.com"))
+        self.make_request(self.reset_query("gaa@email.com"))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_cooldown_per_user(self):
+        self.make_request(self.reset_query("gaa@email.com"))
+        self.make_request(self.reset_query("bar@email.com"))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_cooldown_cancelled_on_failure(self):
+        with mock.patch(
+            "graphql_auth.models.UserStatus.send",
+            mock.MagicMock(side_effect=SMTPException),
+        ):
+            executed = self.make_request(self.resend_query("gaa@email.com"))
+        self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.EMAIL_FAIL)
+        executed = self.make_request(self.resend_query("gaa@email.com"))
+        self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_no_token_signed_during_cooldown(self):
+        self.make_request(self.resend_query("gaa@email.com"))
+        with mock.patch("graphql_auth.models.get_token") as get_token:
+            self.make_request(self.resend_query("gaa@email.com"))
+        self.assertFalse(get_token.called)
@@ -0,0 +1,38 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .testCases import DefaultTestCase
+from graphql_auth.models import UserStatus
+
+
+class EmailIsFreeTestCase(DefaultTestCase):
+    def setUp(self):
+        self.register_user(
+            email="foo@email.com", username="foo", secondary_email="foo2@email.com"
+        )
+        self.register_user(email="bar@email.com", username="bar")
+
+    def test_email_is_free(self):
+        self.assertFalse(UserStatus.email_is_free("foo@email.com"))
+        self.assertFalse(UserStatus.email_is_free("foo2@email.com"))
+        self.assertTrue(UserStatus.email_is_free("free@email.com"))
+
+    def test_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            UserStatus.email_is_free("free@email.com")
+        self.assertEqual(len(queries), 1)
+        self.assertIn("UNION", queries[0]["sql"])
+
+    def test_duplicated_emails_are_not_free(self):
+        # used to be reported free, MultipleObjectsReturned was swallowed
+        self.register_user(email="bar@email.com", username="bar2")
+        self.assertFalse(UserStatus.email_is_free("bar@email.com"))
+
+    def test_emails_in_use(self):
+        with self.assertNumQueries(1):
+            in_use = UserStatus.emails_in_use(
+                ["foo@email.com", "foo2@email.com", "bar@email.com", "free@email.com"]
+            )
+        self.assertEqual(in_use, {"foo@email.com", "foo2@email.com", "bar@email.com"})
+        with self.assertNumQueries(0):
+            self.assertEqual(UserStatus.emails_in_use([]), set())
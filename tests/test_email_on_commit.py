@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import Messages
+from graphql_auth.signals import user_registered
+
+
+@mock.patch("graphql_auth.mixins.app_settings.EMAIL_SEND_ON_COMMIT", True)
+class EmailOnCommitTestCase(DefaultTestCase):
+    """
+    The test case never commits, run the on commit
+    callbacks by hand to simulate it.
+    """
+
+    def register_query(self):
+        return """
+        mutation {
+            register(
+                email: "test@email.com",
+                username: "username",
+                password1: "akssdgfbwkc",
+                password2: "akssdgfbwkc"
+            )
+            { success, errors }
+        }
+        """
+
+    def run_commit_hooks(self):
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, callback in callbacks:
+            callback()
+
+    def test_send_after_commit(self):
+        executed = self.make_request(self.register_query())
+        self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 0)
+        self.run_commit_hooks()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["test@email.com"])
+
+    def test_no_email_on_rollback(self):
+        def fail(*args, **kwargs):
+            raise ValueError
+
+        user_registered.connect(fail)
+        self.addCleanup(user_registered.disconnect, fail)
+        executed = self.make_request(self.register_query(), raw=True)
+        self.assertTrue(executed["errors"])
+        self.assertEqual(get_user_model().objects.count(), 0)
+        self.run_commit_hooks()
+        self.assertEqual(len(mail.outbox), 0)
+
+    @mock.patch("graphql_auth.models.send_email", mock.MagicMock(side_effect=OSError))
+    def test_failure_after_commit_is_logged(self):
+        executed = self.make_request(self.register_query())
+        self.assertEqual(executed["success"], True)
+        with self.assertLogs("graphql_auth.mixins", "ERROR"):
+            self.run_commit_hooks()
+
+    def test_checks_run_before_commit(self):
+        user = self.register_user(email="foo@email.com", username="foo", verified=True)
+        query = """
+        mutation {
+            resendActivationEmail(email: "foo@email.com")
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query)
+        self.assertEqual(executed["success"], False)
+        self.assertEqual(executed["errors"]["email"], Messages.ALREADY_VERIFIED)
+        self.assertFalse(connection.run_on_commit)
+
+    def test_email_in_use_before_commit(self):
+        user = self.register_user(email="foo@email.com", username="foo", verified=True)
+        self.register_user(email="bar@email.com", username="bar")
+        query = """
+        mutation {
+            sendSecondaryEmailActivation(email: "bar@email.com", password: "%s")
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query % self.default_password, {"user": user})
+        self.assertEqual(executed["success"], False)
+        self.assertEqual(executed["errors"]["email"], Messages.EMAIL_IN_USE)
+        self.assertFalse(connection.run_on_commit)
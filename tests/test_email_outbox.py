@@ -0,0 +1,130 @@
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .testCases import DefaultTestCase
+from graphql_auth.models import EmailOutbox
+
+
+@mock.patch("graphql_auth.models.app_settings.EMAIL_OUTBOX", True)
+class EmailOutboxRegisterTestCase(DefaultTestCase):
+    def register_query(self):
+        return """
+        mutation {
+            register(
+                email: "test@email.com",
+                username: "username",
+                password1: "akssdgfbwkc",
+                password2: "akssdgfbwkc"
+            )
+            { success, errors }
+        }
+        """
+
+    def test_register_writes_to_outbox(self):
+        executed = self.make_request(self.register_query())
+        self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.status, EmailOutbox.PENDING)
+        self.assertEqual(email.recipient_list, ["test@email.com"])
+        self.assertTrue(email.html_message)
+
+        call_command("send_outbox_emails", stdout=StringIO())
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailOutbox.SENT)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["test@email.com"])
+
+
+class EmailOutboxProcessTestCase(TestCase):
+    def enqueue(self):
+        return EmailOutbox.enqueue(
+            subject="subject",
+            message="message",
+            html_message="<p>message</p>",
+            recipient_list=["foo@email.com", "bar@email.com"],
+        )
+
+    def test_process_batch(self):
+        for _ in range(3):
+            self.enqueue()
+        self.assertEqual(EmailOutbox.process_batch(batch_size=2), (2, 0))
+        self.assertEqual(EmailOutbox.process_batch(batch_size=2), (1, 0))
+        self.assertEqual(EmailOutbox.process_batch(batch_size=2), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ["foo@email.com", "bar@email.com"])
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>message</p>", "text/html")])
+
+    def test_not_due_emails_are_skipped(self):
+        email = self.enqueue()
+        email.next_attempt_at = timezone.now() + timedelta(minutes=1)
+        email.save()
+        self.assertEqual(EmailOutbox.process_batch(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+    @mock.patch(
+        "django.core.mail.EmailMultiAlternatives.send",
+        mock.MagicMock(side_effect=SMTPException("down")),
+    )
+    def test_retry_with_backoff(self):
+        email = self.enqueue()
+        self.assertEqual(EmailOutbox.process_batch(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailOutbox.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn("down", email.last_error)
+        first_delay = email.next_attempt_at - timezone.now()
+        self.assertTrue(timedelta(seconds=50) < first_delay <= timedelta(minutes=1))
+
+        email.next_attempt_at = timezone.now()
+        email.save()
+        EmailOutbox.process_batch()
+        email.refresh_from_db()
+        second_delay = email.next_attempt_at - timezone.now()
+        self.assertTrue(timedelta(seconds=110) < second_delay <= timedelta(minutes=2))
+
+    @mock.patch("graphql_auth.models.app_settings.EMAIL_OUTBOX_MAX_ATTEMPTS", 1)
+    @mock.patch(
+        "django.core.mail.EmailMultiAlternatives.send",
+        mock.MagicMock(side_effect=SMTPException),
+    )
+    def test_give_up_after_max_attempts(self):
+        email = self.enqueue()
+        EmailOutbox.process_batch()
+        email.refresh_from_db()
+        self.assertEqual(email.status, EmailOutbox.FAILED)
+
+
+class EmailOutboxLeaseTestCase(TransactionTestCase):
+    def test_send_outside_transaction(self):
+        email = EmailOutbox.enqueue(
+            subject="subject",
+            message="message",
+            html_message="",
+            recipient_list=["foo@email.com"],
+        )
+        during_send = []
+
+        def send(*args, **kwargs):
+            leased = EmailOutbox.objects.get(pk=email.pk)
+            during_send.append((connection.in_atomic_block, leased.next_attempt_at))
+            raise SMTPException("down")
+
+        with mock.patch("django.core.mail.EmailMultiAlternatives.send", send):
+            self.assertEqual(EmailOutbox.process_batch(), (0, 1))
+        (in_atomic_block, leased_until), = during_send
+        self.assertFalse(in_atomic_block)
+        # not claimed again by another worker while it is sent
+        self.assertTrue(leased_until > timezone.now() + timedelta(minutes=9))
+        email.refresh_from_db()
+        self.assertEqual(email.attempts, 1)
+        self.assertTrue(email.next_attempt_at < timezone.now() + timedelta(minutes=2))
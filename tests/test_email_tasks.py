@@ -0,0 +1,77 @@
+import json
+import pickle
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import TokenAction
+from graphql_auth.tasks import EmailTask, run_email_task
+
+
+def pickling_async_email(func, args):
+    """
+    Stand-in for a process pool or a task queue.
+    """
+    func, args = pickle.loads(pickle.dumps((func, args)))
+    return func(*args)
+
+
+@mock.patch("graphql_auth.mixins.async_email_func", pickling_async_email)
+@mock.patch("graphql_auth.mixins.app_settings.EMAIL_ASYNC_TASK_SERIALIZABLE", True)
+class SerializableEmailTaskMutationTestCase(DefaultTestCase):
+    def setUp(self):
+        self.user = self.register_user(
+            email="gaa@email.com", username="gaa", verified=False
+        )
+
+    def test_resend_activation_email(self):
+        query = """
+        mutation {
+        resendActivationEmail(email: "gaa@email.com")
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query)
+        self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["gaa@email.com"])
+
+
+class EmailTaskTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="foo", email="foo@email.com"
+        )
+        self.info = mock.MagicMock()
+        self.info.context.get_host.return_value = "example.com"
+        self.info.context.get_port.return_value = "80"
+        self.info.context.is_secure.return_value = False
+
+    def test_task(self):
+        task = self.user.status.send_secondary_email_activation(
+            self.info, "secondary@email.com", task=True
+        )
+        self.assertIsInstance(task, EmailTask)
+        self.assertEqual(task.user_pk, self.user.pk)
+        self.assertEqual(task.action, TokenAction.ACTIVATION_SECONDARY_EMAIL)
+        self.assertEqual(task.recipient_list, ["secondary@email.com"])
+        self.assertEqual(task.token_kwargs, {"secondary_email": "secondary@email.com"})
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_run_task_after_json_round_trip(self):
+        task = self.user.status.send_password_reset_email(self.info, task=True)
+        run_email_task(json.loads(json.dumps(task)))
+        run_email_task(json.loads(json.dumps(task._asdict())))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["foo@email.com"])
+
+    def test_token_is_created_when_run(self):
+        task = self.user.status.send_activation_email(self.info, task=True)
+        with mock.patch("graphql_auth.models.get_token") as get_token:
+            get_token.return_value = "token"
+            pickling_async_email(run_email_task, (task,))
+        get_token.assert_called_once_with(self.user, TokenAction.ACTIVATION)
+        self.assertIn("token", mail.outbox[0].body)
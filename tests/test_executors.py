@@ -0,0 +1,97 @@
+import threading
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase
+
+from .testCases import DefaultTestCase
+from graphql_auth.executors import EmailThreadPool, thread_pool_email_task
+
+
+class EmailThreadPoolTestCase(TestCase):
+    def test_run_and_drain(self):
+        pool = EmailThreadPool(workers=2, queue_size=10)
+        results = []
+        for i in range(5):
+            self.assertTrue(pool.submit(results.append, (i,)))
+        pool.shutdown()
+        self.assertEqual(sorted(results), [0, 1, 2, 3, 4])
+        metrics = pool.metrics()
+        self.assertEqual(metrics["submitted"], 5)
+        self.assertEqual(metrics["completed"], 5)
+        self.assertEqual(metrics["queue_depth"], 0)
+        with self.assertRaises(RuntimeError):
+            pool.submit(results.append, (5,))
+
+    def test_failures_are_counted(self):
+        pool = EmailThreadPool(workers=1)
+
+        def fail():
+            raise OSError
+
+        with self.assertLogs("graphql_auth.executors", "ERROR"):
+            pool.submit(fail)
+            pool.shutdown()
+        self.assertEqual(pool.metrics()["failed"], 1)
+
+    def test_shed_when_full(self):
+        pool = EmailThreadPool(workers=1, queue_size=1, full_policy="shed")
+        started, release = threading.Event(), threading.Event()
+
+        def wait():
+            started.set()
+            release.wait()
+
+        pool.submit(wait)
+        started.wait()
+        self.assertTrue(pool.submit(wait))  # fills the queue
+        with self.assertLogs("graphql_auth.executors", "WARNING"):
+            self.assertFalse(pool.submit(wait))
+        self.assertEqual(pool.metrics()["shed"], 1)
+        self.assertEqual(pool.queue_depth, 1)
+        release.set()
+        pool.shutdown()
+        self.assertEqual(pool.metrics()["completed"], 2)
+
+    def test_block_when_full(self):
+        pool = EmailThreadPool(workers=1, queue_size=1)
+        release = threading.Event()
+        pool.submit(release.wait)
+        pool.submit(release.wait)
+        submitted = threading.Event()
+
+        def submit():
+            pool.submit(release.wait)
+            submitted.set()
+
+        threading.Thread(target=submit).start()
+        self.assertFalse(submitted.wait(0.2))
+        release.set()
+        self.assertTrue(submitted.wait(5))
+        pool.shutdown()
+        self.assertEqual(pool.metrics()["completed"], 3)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            EmailThreadPool(full_policy="drop")
+
+
+class ThreadPoolEmailTaskTestCase(DefaultTestCase):
+    def test_resend_activation_email(self):
+        self.register_user(email="gaa@email.com", username="gaa", verified=False)
+        pool = EmailThreadPool(workers=1)
+        query = """
+        mutation {
+        resendActivationEmail(email: "gaa@email.com")
+            { success, errors }
+        }
+        """
+        with mock.patch(
+            "graphql_auth.mixins.async_email_func", thread_pool_email_task
+        ), mock.patch(
+            "graphql_auth.executors.get_email_thread_pool", return_value=pool
+        ):
+            executed = self.make_request(query)
+        pool.shutdown()
+        self.assertEqual(executed["success"], True)
+        self.assertEqual(len(mail.outbox), 1)
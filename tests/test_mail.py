@@ -0,0 +1,98 @@
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+from unittest import mock
+
+from django.core import mail
+from django.test import TestCase, override_settings
+
+from graphql_auth.mail import ConnectionPool, get_connection_pool, send_email
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+def smtp_factory():
+    """
+    Stand-in for smtplib.SMTP, one instance per opened connection.
+    """
+    instances = []
+
+    def factory(*args, **kwargs):
+        smtp = mock.MagicMock()
+        smtp.noop.return_value = (250, b"OK")
+        smtp.sendmail.return_value = {}
+        instances.append(smtp)
+        return smtp
+
+    return factory, instances
+
+
+class ConnectionPoolTestCase(TestCase):
+    def setUp(self):
+        factory, self.smtp_instances = smtp_factory()
+        patcher = mock.patch("django.core.mail.backends.smtp.smtplib.SMTP", factory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, pool):
+        with pool.connection() as connection:
+            mail.EmailMessage(
+                "subject",
+                "body",
+                "from@email.com",
+                ["to@email.com"],
+                connection=connection,
+            ).send()
+
+    def test_reuse_connection(self):
+        pool = ConnectionPool(max_size=2, backend=SMTP_BACKEND)
+        for _ in range(5):
+            self.send(pool)
+        self.assertEqual(len(self.smtp_instances), 1)
+        self.assertEqual(self.smtp_instances[0].sendmail.call_count, 5)
+        self.assertEqual(len(pool), 1)
+
+    def test_dead_connection_is_replaced(self):
+        pool = ConnectionPool(backend=SMTP_BACKEND)
+        self.send(pool)
+        self.smtp_instances[0].noop.side_effect = SMTPServerDisconnected
+        self.send(pool)
+        self.assertEqual(len(self.smtp_instances), 2)
+        self.assertEqual(self.smtp_instances[1].sendmail.call_count, 1)
+
+    def test_idle_connection_is_evicted(self):
+        pool = ConnectionPool(idle_timeout=0, backend=SMTP_BACKEND)
+        self.send(pool)
+        self.send(pool)
+        self.assertEqual(len(self.smtp_instances), 2)
+        self.assertTrue(self.smtp_instances[0].quit.called)
+
+    def test_max_size(self):
+        pool = ConnectionPool(max_size=1, backend=SMTP_BACKEND)
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(len(pool), 1)
+        self.assertTrue(self.smtp_instances[1].quit.called)
+        pool.close_all()
+        self.assertEqual(len(pool), 0)
+        self.assertTrue(self.smtp_instances[0].quit.called)
+
+    def test_connection_is_discarded_on_error(self):
+        pool = ConnectionPool(backend=SMTP_BACKEND)
+        with self.assertRaises(SMTPServerDisconnected):
+            with pool.connection():
+                raise SMTPServerDisconnected
+        self.assertEqual(len(pool), 0)
+
+    @override_settings(EMAIL_BACKEND=SMTP_BACKEND)
+    @mock.patch("graphql_auth.mail.app_settings.EMAIL_CONNECTION_POOL", True)
+    @mock.patch(
+        "graphql_auth.mail.app_settings.EMAIL_CONNECTION_POOL_IDLE_TIMEOUT",
+        timedelta(seconds=60),
+    )
+    def test_send_email_uses_pool(self):
+        for _ in range(3):
+            send_email("subject", "body", "<p>body</p>", ["to@email.com"])
+        self.assertEqual(len(self.smtp_instances), 1)
+        self.assertEqual(self.smtp_instances[0].sendmail.call_count, 3)
+        self.assertEqual(len(get_connection_pool()), 1)
@@ -0,0 +1,109 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.state import ProjectState
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from graphql_auth.contrib.indexes.operations import (
+    ARCHIVED_INDEX,
+    INVALID,
+    UNVERIFIED_INDEX,
+    MISSING,
+    PRESENT,
+    SECONDARY_EMAIL_INDEX,
+    STATUS_FLAGS_INDEX,
+    USER_EMAIL_LOWER_INDEX,
+    AddIndexOnline,
+    get_index_state,
+    get_indexes,
+)
+
+
+class OnlineIndexesTestCase(TransactionTestCase):
+    def setUp(self):
+        self.state = ProjectState.from_apps(apps)
+        self.operation = AddIndexOnline(SECONDARY_EMAIL_INDEX)
+        self.model, self.index = get_indexes(apps)[SECONDARY_EMAIL_INDEX]
+
+    def forwards(self):
+        with connection.schema_editor(atomic=False) as editor:
+            self.operation.database_forwards(
+                "graphql_auth_indexes", editor, self.state, self.state
+            )
+
+    def backwards(self):
+        with connection.schema_editor(atomic=False) as editor:
+            self.operation.database_backwards(
+                "graphql_auth_indexes", editor, self.state, self.state
+            )
+
+    def test_created_by_migration(self):
+        for model, index in get_indexes(apps).values():
+            self.assertEqual(get_index_state(connection, model, index), PRESENT)
+
+    def test_existing_index_is_skipped(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.forwards()
+        self.assertFalse([q for q in queries if "CREATE INDEX" in q["sql"]])
+
+    def test_backwards_and_forwards(self):
+        self.backwards()
+        self.assertEqual(get_index_state(connection, self.model, self.index), MISSING)
+        # already gone
+        self.backwards()
+        self.forwards()
+        self.assertEqual(get_index_state(connection, self.model, self.index), PRESENT)
+
+    def test_concurrently(self):
+        with connection.schema_editor(atomic=False) as editor, mock.patch.object(
+            AddIndexOnline, "_is_concurrent", return_value=True
+        ), mock.patch.object(editor, "execute") as execute, mock.patch(
+            "graphql_auth.contrib.indexes.operations.get_index_state",
+            return_value=INVALID,
+        ):
+            self.operation.database_forwards(
+                "graphql_auth_indexes", editor, self.state, self.state
+            )
+        (drop,), _ = execute.call_args_list[0]
+        (create,), _ = execute.call_args_list[1]
+        self.assertTrue(drop.startswith("DROP INDEX CONCURRENTLY "))
+        self.assertTrue(create.startswith("CREATE INDEX CONCURRENTLY "))
+        self.assertIn(SECONDARY_EMAIL_INDEX, create)
+
+    def test_lower_email_index(self):
+        self.operation = AddIndexOnline(USER_EMAIL_LOWER_INDEX)
+        model, index = get_indexes(apps)[USER_EMAIL_LOWER_INDEX]
+        self.backwards()
+        self.assertEqual(get_index_state(connection, model, index), MISSING)
+        self.forwards()
+        self.assertEqual(get_index_state(connection, model, index), PRESENT)
+
+    @skipUnless(connection.vendor == "sqlite", "sqlite introspection")
+    def test_partial_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA index_list(graphql_auth_userstatus)")
+            # seq, name, unique, origin, partial
+            partial = {row[1]: row[4] for row in cursor.fetchall()}
+            cursor.execute("PRAGMA index_info(%s)" % ARCHIVED_INDEX)
+            columns = [row[2] for row in cursor.fetchall()]
+        self.assertEqual(partial[UNVERIFIED_INDEX], 1)
+        self.assertEqual(partial[ARCHIVED_INDEX], 1)
+        self.assertEqual(partial[STATUS_FLAGS_INDEX], 0)
+        self.assertEqual(columns, ["user_id"])
+
+    def test_report(self):
+        out = StringIO()
+        call_command("graphql_auth_indexes", stdout=out)
+        self.assertIn("%s on " % SECONDARY_EMAIL_INDEX, out.getvalue())
+        self.assertNotIn(MISSING, out.getvalue())
+
+        self.backwards()
+        self.addCleanup(self.forwards)
+        out = StringIO()
+        call_command("graphql_auth_indexes", stdout=out)
+        self.assertIn("(secondary_email): missing", out.getvalue())
+        self.assertIn("1 indexes are missing", out.getvalue())
@@ -4,11 +4,14 @@ from unittest import mock
 from pytest import mark
 
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from .testCases import RelayTestCase, DefaultTestCase
 from .decorators import skipif_django_21
 
 from graphql_auth.constants import Messages
+from graphql_auth.models import UserStatus
 from graphql_auth.signals import user_registered
 from graphql_auth.utils import get_token, get_token_payload
 
@@ -94,6 +97,36 @@ class RegisterTestCaseMixin:
         self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.EMAIL_FAIL)
         self.assertEqual(len(get_user_model().objects.all()), 0)
 
+    def test_register_creates_status_with_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            executed = self.make_request(self.register_query())
+        self.assertEqual(executed["success"], True)
+        status_queries = [
+            q["sql"] for q in queries if "graphql_auth_userstatus" in q["sql"]
+        ]
+        inserts = [q for q in status_queries if q.startswith("INSERT")]
+        # get_or_create or user.status lookups
+        lookups = [q for q in status_queries if '"user_id" =' in q]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(lookups, [])
+        self.assertTrue(get_user_model().objects.get(username="username").status)
+
+    def test_attached_status_saved_with_user_pk(self):
+        user_ids = []
+        save = UserStatus.save
+
+        def record_save(status, *args, **kwargs):
+            # before Model.save, which fills it from the user from Django 3.0
+            user_ids.append(status.user_id)
+            return save(status, *args, **kwargs)
+
+        user = get_user_model()(username="attached", email="attached@email.com")
+        UserStatus.attach(user)
+        with mock.patch.object(UserStatus, "save", record_save):
+            user.save()
+        self.assertEqual(user_ids, [user.pk])
+        self.assertTrue(UserStatus.objects.filter(user=user).exists())
+
     @mark.settings_b
     @skipif_django_21()
     def test_register_with_different_settings(self):
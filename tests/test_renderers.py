@@ -0,0 +1,176 @@
+import os
+import tempfile
+from importlib.util import find_spec
+from unittest import mock
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils.html import strip_tags
+
+from graphql_auth.models import UserStatus
+from graphql_auth.renderers import (
+    DjangoTemplateRenderer,
+    Jinja2Renderer,
+    SimpleRenderer,
+    get_renderer,
+)
+
+TEMPLATES = [
+    "email/activation_email.html",
+    "email/activation_subject.txt",
+    "email/password_reset_email.html",
+    "email/password_reset_subject.txt",
+]
+
+
+class RendererTestCaseMixin:
+    def setUp(self):
+        self.context = {
+            "user": get_user_model()(username="foo <bar>"),
+            "token": "abc:123",
+            "protocol": "https",
+            "domain": "example.com",
+            "site_name": "Example & co",
+            "path": "activate",
+        }
+
+    def test_same_output_as_django(self):
+        renderer = self.renderer_class()
+        for name in TEMPLATES:
+            self.assertEqual(
+                renderer.render(name, self.context).strip(),
+                render_to_string(name, self.context).strip(),
+            )
+
+    def test_render_text(self):
+        renderer = self.renderer_class()
+        for name in TEMPLATES:
+            self.assertEqual(
+                renderer.render_text(name, self.context).strip(),
+                strip_tags(render_to_string(name, self.context)).strip(),
+            )
+
+    def test_compile_once(self):
+        renderer = self.renderer_class()
+        with mock.patch.object(
+            renderer, "compile", wraps=renderer.compile
+        ) as compile_mock:
+            for _ in range(3):
+                renderer.render(TEMPLATES[0], self.context)
+        self.assertEqual(compile_mock.call_count, 1)
+        with mock.patch.object(
+            renderer, "compile_text", wraps=renderer.compile_text
+        ) as compile_mock:
+            for _ in range(3):
+                renderer.render_text(TEMPLATES[0], self.context)
+        self.assertEqual(compile_mock.call_count, 1)
+
+
+class ExtendedTemplateTestCaseMixin:
+    def test_render_text_extended_template(self):
+        files = {
+            "base.html": (
+                "<html><body><h1>Brand</h1>"
+                "{% block content %}{% endblock %}</body></html>"
+            ),
+            "child.html": (
+                '{% extends "base.html" %}'
+                "{% block content %}Hello {{ user.username }}{% endblock %}"
+            ),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in files.items():
+                with open(os.path.join(directory, name), "w") as f:
+                    f.write(source)
+            templates = [
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "DIRS": [directory],
+                }
+            ]
+            with override_settings(TEMPLATES=templates):
+                renderer = self.renderer_class()
+                text = renderer.render_text(
+                    "child.html", {"user": get_user_model()(username="bob")}
+                )
+        self.assertEqual(text, "BrandHello bob")
+
+
+class DjangoTemplateRendererTestCase(
+    ExtendedTemplateTestCaseMixin, RendererTestCaseMixin, TestCase
+):
+    renderer_class = DjangoTemplateRenderer
+
+
+class SimpleRendererTestCase(RendererTestCaseMixin, TestCase):
+    renderer_class = SimpleRenderer
+
+    def test_missing_variable(self):
+        renderer = SimpleRenderer()
+        template = renderer.compile_string("a {{ missing.value }} b {{ x }}")
+        self.assertEqual(renderer.render_compiled(template, {"x": 1}), "a  b 1")
+
+    def test_alters_data_not_called(self):
+        user = get_user_model().objects.create(username="foo")
+        renderer = SimpleRenderer()
+        template = renderer.compile_string("{{ user.delete }}{{ user.get_username }}")
+        self.assertEqual(renderer.render_compiled(template, {"user": user}), "foo")
+        self.assertTrue(get_user_model().objects.filter(pk=user.pk).exists())
+
+    def test_do_not_call_in_templates(self):
+        class Choices:
+            do_not_call_in_templates = True
+            label = "label"
+
+            def __call__(self):
+                raise AssertionError
+
+        renderer = SimpleRenderer()
+        template = renderer.compile_string("{{ choices.label }}")
+        self.assertEqual(
+            renderer.render_compiled(template, {"choices": Choices()}), "label"
+        )
+
+
+@pytest.mark.skipif(find_spec("jinja2") is None, reason="jinja2 is not installed")
+class Jinja2RendererTestCase(
+    ExtendedTemplateTestCaseMixin, RendererTestCaseMixin, TestCase
+):
+    renderer_class = Jinja2Renderer
+
+
+class GetRendererTestCase(TestCase):
+    def test_default_renderer(self):
+        self.assertIsInstance(get_renderer(), DjangoTemplateRenderer)
+        self.assertIs(get_renderer(), get_renderer())
+
+
+class TextTemplateTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username="foo", email="foo@email.com"
+        )
+
+    def send(self):
+        info = mock.MagicMock()
+        info.context.get_port.return_value = "80"
+        info.context.is_secure.return_value = False
+        self.user.status.send_activation_email(info)
+        return mail.outbox[-1]
+
+    def test_stripped_html_by_default(self):
+        email = self.send()
+        self.assertEqual(email.body, strip_tags(email.alternatives[0][0]))
+
+    @mock.patch(
+        "graphql_auth.models.app_settings.EMAIL_TEMPLATE_ACTIVATION_TXT",
+        "email/activation_subject.txt",
+    )
+    def test_text_template(self):
+        email = self.send()
+        self.assertTrue(email.body.startswith("Activate your account on"))
+        self.assertIn("<p>", email.alternatives[0][0])
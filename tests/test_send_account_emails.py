@@ -0,0 +1,187 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from .testCases import DefaultTestCase
+from graphql_auth.management.commands.send_account_emails import Command
+from graphql_auth.models import UserStatus
+from graphql_auth.utils import clear_url_contexts
+
+
+@mock.patch("graphql_auth.utils.app_settings.EMAIL_BASE_URL", "https://example.com")
+@mock.patch(
+    "graphql_auth.management.commands.send_account_emails.app_settings.EMAIL_BASE_URL",
+    "https://example.com",
+)
+class SendAccountEmailsTestCase(DefaultTestCase):
+    def setUp(self):
+        clear_url_contexts()
+        self.addCleanup(clear_url_contexts)
+        self.users = [
+            self.register_user(
+                email="user%s@%s" % (i, domain), username="user%s" % i, verified=True
+            )
+            for i, domain in enumerate(["a.com", "a.com", "b.com"])
+        ]
+        self.inactive = self.register_user(
+            email="inactive@a.com", username="inactive", verified=True, is_active=False
+        )
+        fd, self.checkpoint = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.checkpoint)
+        self.addCleanup(
+            lambda: os.path.exists(self.checkpoint) and os.remove(self.checkpoint)
+        )
+
+    def call(self, *args):
+        out = StringIO()
+        call_command("send_account_emails", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_password_reset(self):
+        out = self.call("password_reset", "--filter", "is_active=True")
+        self.assertIn("Sent 3 emails, 0 failed.", out)
+        self.assertEqual(
+            sorted(m.to[0] for m in mail.outbox),
+            ["user0@a.com", "user1@a.com", "user2@b.com"],
+        )
+        self.assertIn("https://example.com/password-reset/", mail.outbox[0].body)
+
+    def test_unverify(self):
+        self.call("activation", "--unverify", "--filter", "username=user0")
+        self.assertEqual(len(mail.outbox), 1)
+        statuses = UserStatus.objects.filter(verified=False)
+        self.assertEqual([s.user.username for s in statuses], ["user0"])
+
+    def test_resume_from_checkpoint(self):
+        self.call(
+            "password_reset",
+            "--filter",
+            "username__in=user0,user1",
+            "--chunk-size",
+            "1",
+            "--checkpoint",
+            self.checkpoint,
+        )
+        with open(self.checkpoint) as f:
+            self.assertEqual(
+                json.load(f), {"last_pk": str(self.users[1].pk), "failed": []}
+            )
+        mail.outbox = []
+        out = self.call(
+            "password_reset",
+            "--filter",
+            "is_active=True",
+            "--checkpoint",
+            self.checkpoint,
+        )
+        self.assertIn("Sent 1 emails", out)
+        self.assertEqual(mail.outbox[0].to, ["user2@b.com"])
+
+    def test_failures_are_counted(self):
+        with mock.patch(
+            "graphql_auth.management.commands.send_account_emails.send_email",
+            side_effect=OSError,
+        ):
+            out = self.call("password_reset", "--filter", "is_active=True")
+        self.assertIn("Sent 0 emails, 3 failed.", out)
+
+    def test_failures_are_retried(self):
+        def send_email(recipient_list, **kwargs):
+            if recipient_list == ["user1@a.com"]:
+                raise OSError
+
+        with mock.patch(
+            "graphql_auth.management.commands.send_account_emails.send_email",
+            side_effect=send_email,
+        ):
+            out = self.call(
+                "activation",
+                "--unverify",
+                "--filter",
+                "is_active=True",
+                "--checkpoint",
+                self.checkpoint,
+            )
+        self.assertIn("Sent 2 emails, 1 failed.", out)
+        statuses = UserStatus.objects.filter(verified=False).order_by("user__pk")
+        self.assertEqual([s.user.username for s in statuses], ["user0", "user2"])
+        with open(self.checkpoint) as f:
+            self.assertEqual(
+                json.load(f),
+                {"last_pk": str(self.users[2].pk), "failed": [str(self.users[1].pk)]},
+            )
+
+        out = self.call(
+            "password_reset",
+            "--filter",
+            "is_active=True",
+            "--checkpoint",
+            self.checkpoint,
+        )
+        self.assertIn("Sent 1 emails, 0 failed.", out)
+        self.assertEqual(mail.outbox[0].to, ["user1@a.com"])
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["failed"], [])
+
+    def test_retries_keep_the_checkpoint(self):
+        with open(self.checkpoint, "w") as f:
+            json.dump(
+                {
+                    "last_pk": str(self.users[2].pk),
+                    "failed": [str(self.users[0].pk), str(self.users[1].pk)],
+                },
+                f,
+            )
+        checkpoints = []
+        write_checkpoint = Command.write_checkpoint
+
+        def record_checkpoint(command, path, pk, failed_pks):
+            checkpoints.append(pk)
+            write_checkpoint(command, path, pk, failed_pks)
+
+        with mock.patch.object(Command, "write_checkpoint", record_checkpoint):
+            out = self.call(
+                "password_reset",
+                "--filter",
+                "is_active=True",
+                "--chunk-size",
+                "1",
+                "--checkpoint",
+                self.checkpoint,
+            )
+        self.assertIn("Sent 2 emails, 0 failed.", out)
+        # never moved back to the retried pks
+        self.assertEqual(checkpoints, [self.users[2].pk, self.users[2].pk])
+        with open(self.checkpoint) as f:
+            self.assertEqual(
+                json.load(f), {"last_pk": str(self.users[2].pk), "failed": []}
+            )
+
+    def test_invalid_checkpoint(self):
+        with open(self.checkpoint, "w") as f:
+            f.write(str(self.users[1].pk))
+        with self.assertRaises(CommandError):
+            self.call("password_reset", "--checkpoint", self.checkpoint)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_dry_run(self):
+        out = self.call("password_reset", "--dry-run")
+        self.assertIn("4 users would receive an email.", out)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_unverify_requires_activation(self):
+        with self.assertRaises(CommandError):
+            self.call("password_reset", "--unverify")
+
+
+class SendAccountEmailsBaseUrlTestCase(DefaultTestCase):
+    def test_requires_base_url(self):
+        with self.assertRaises(CommandError):
+            call_command("send_account_emails", "password_reset", stdout=StringIO())
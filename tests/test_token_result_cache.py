@@ -0,0 +1,113 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.signing import BadSignature
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import Messages, TokenAction
+from graphql_auth.utils import get_token
+
+
+@mock.patch(
+    "graphql_auth.utils.app_settings.TOKEN_RESULT_CACHE_TIMEOUT", timedelta(minutes=5)
+)
+class TokenResultCacheTestCase(DefaultTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.register_user(
+            email="foo@email.com", username="foo", verified=False
+        )
+
+    def verify_query(self, token):
+        return """
+        mutation {
+            verifyAccount(token: "%s")
+                { success, errors }
+            }
+        """ % (
+            token
+        )
+
+    def password_reset_query(self, token):
+        return """
+        mutation {
+            passwordReset(
+                token: "%s",
+                newPassword1: "new_password",
+                newPassword2: "new_password"
+            )
+            { success, errors }
+        }
+        """ % (
+            token
+        )
+
+    def test_repeated_verify(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        executed = self.make_request(self.verify_query(token))
+        self.assertEqual(executed["success"], True)
+        with mock.patch("graphql_auth.models.get_token_payload") as payload:
+            executed = self.make_request(self.verify_query(token))
+        payload.assert_not_called()
+        self.assertEqual(
+            executed["errors"]["nonFieldErrors"], Messages.ALREADY_VERIFIED
+        )
+
+    def test_invalid_token(self):
+        self.make_request(self.verify_query("faketoken"))
+        with self.assertNumQueries(0):
+            executed = self.make_request(self.verify_query("faketoken"))
+        self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.INVALID_TOKEN)
+
+    def test_token_of_another_mutation(self):
+        token = get_token(
+            self.user,
+            TokenAction.ACTIVATION_SECONDARY_EMAIL,
+            secondary_email="new@email.com",
+        )
+        for _ in range(2):
+            executed = self.make_request(self.verify_query(token))
+            self.assertEqual(
+                executed["errors"]["nonFieldErrors"], Messages.INVALID_TOKEN
+            )
+        query = 'mutation { verifySecondaryEmail(token: "%s") { success, errors } }'
+        executed = self.make_request(query % token)
+        self.assertEqual(executed["success"], True)
+
+    def test_cached_per_mutation(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        self.make_request(self.verify_query(token))
+        # ALREADY_VERIFIED is cached for verifyAccount only
+        executed = self.make_request(self.password_reset_query(token))
+        self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.INVALID_TOKEN)
+
+    def test_expired_password_reset(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        with mock.patch(
+            "graphql_auth.mixins.app_settings.EXPIRATION_PASSWORD_RESET_TOKEN",
+            timedelta(seconds=-1),
+        ):
+            executed = self.make_request(self.password_reset_query(token))
+        self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.EXPIRED_TOKEN)
+        with mock.patch("graphql_auth.mixins.get_token_payload") as payload:
+            executed = self.make_request(self.password_reset_query(token))
+        payload.assert_not_called()
+        self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.EXPIRED_TOKEN)
+
+    def test_password_reset_success_not_cached(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        for _ in range(2):
+            executed = self.make_request(self.password_reset_query(token))
+            self.assertEqual(executed["success"], True)
+
+    def test_disabled(self):
+        with mock.patch(
+            "graphql_auth.utils.app_settings.TOKEN_RESULT_CACHE_TIMEOUT", None
+        ):
+            self.make_request(self.verify_query("faketoken"))
+            with mock.patch(
+                "graphql_auth.models.get_token_payload", side_effect=BadSignature
+            ) as payload:
+                self.make_request(self.verify_query("faketoken"))
+        payload.assert_called_once()
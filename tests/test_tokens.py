@@ -0,0 +1,282 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.signing import BadSignature, SignatureExpired
+
+from .testCases import DefaultTestCase
+from graphql_auth import tokens
+from graphql_auth.constants import TokenAction
+from graphql_auth.exceptions import TokenScopeError
+from graphql_auth.models import UserStatus
+from graphql_auth.utils import get_token, get_token_payload, get_tokens
+
+
+@mock.patch("graphql_auth.utils.app_settings.TOKEN_FORMAT", "compact")
+class CompactTokenTestCase(DefaultTestCase):
+    def setUp(self):
+        self.user = self.register_user(email="foo@email.com", username="foo")
+
+    def test_round_trip(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        self.assertTrue(tokens.is_compact(token))
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"pk": self.user.pk}
+        )
+
+    def test_extra_fields(self):
+        token = get_token(
+            self.user,
+            TokenAction.ACTIVATION_SECONDARY_EMAIL,
+            secondary_email="bär@email.com",
+        )
+        payload = get_token_payload(token, TokenAction.ACTIVATION_SECONDARY_EMAIL)
+        self.assertEqual(
+            payload, {"pk": self.user.pk, "secondary_email": "bär@email.com"}
+        )
+
+    def test_shorter_than_signing(self):
+        compact = get_token(self.user, TokenAction.PASSWORD_RESET)
+        legacy = signing.dumps({"username": "foo", "action": "password_reset"})
+        self.assertLess(len(compact) * 2, len(legacy))
+
+    def test_large_pk(self):
+        token = tokens.dumps(2 ** 40 + 3, TokenAction.PASSWORD_SET)
+        self.assertEqual(
+            tokens.loads(token), (TokenAction.PASSWORD_SET, {"pk": 2 ** 40 + 3})
+        )
+
+    def test_tampered(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        data = bytearray(tokens.base64.urlsafe_b64decode(token + "=="))
+        data[2] ^= 1
+        tampered = tokens.base64.urlsafe_b64encode(bytes(data)).rstrip(b"=").decode()
+        with self.assertRaises(BadSignature):
+            get_token_payload(tampered, TokenAction.ACTIVATION)
+        for garbage in ["", "a", "faketoken", "AAAAAAAAAAAAAAAAAAAA"]:
+            with self.assertRaises(BadSignature):
+                get_token_payload(garbage, TokenAction.ACTIVATION)
+
+    def test_expired(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        with mock.patch("graphql_auth.tokens.time.time", return_value=time.time() + 61):
+            with self.assertRaises(SignatureExpired):
+                get_token_payload(
+                    token, TokenAction.PASSWORD_RESET, timedelta(seconds=60)
+                )
+
+    def test_scope(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        with self.assertRaises(TokenScopeError):
+            get_token_payload(token, TokenAction.ACTIVATION)
+
+    def test_signing_tokens_still_accepted(self):
+        with mock.patch("graphql_auth.utils.app_settings.TOKEN_FORMAT", "signing"):
+            token = get_token(self.user, TokenAction.ACTIVATION)
+        self.assertFalse(tokens.is_compact(token))
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"username": "foo"}
+        )
+
+    def test_unknown_action_falls_back(self):
+        token = get_token(self.user, "custom")
+        self.assertFalse(tokens.is_compact(token))
+
+    def test_verify_account(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        query = """
+        mutation {
+            verifyAccount(token: "%s")
+                { success, errors }
+            }
+        """
+        executed = self.make_request(query % token)
+        self.assertEqual(executed["success"], True)
+        self.user.status.refresh_from_db()
+        self.assertTrue(self.user.status.verified)
+
+
+class TokenSignerTestCase(DefaultTestCase):
+    def setUp(self):
+        tokens.clear_signers()
+        self.addCleanup(tokens.clear_signers)
+        self.user = self.register_user(email="foo@email.com", username="foo")
+
+    def test_same_signature_as_django(self):
+        signer = tokens.CachedTimestampSigner(salt="graphql_auth.activation")
+        django_signer = signing.TimestampSigner(salt="graphql_auth.activation")
+        self.assertEqual(signer.signature("value"), django_signer.signature("value"))
+        self.assertEqual(signer.algorithm, getattr(django_signer, "algorithm", "sha1"))
+
+    def get_sha1_token(self):
+        signer = tokens.TokenSigner("graphql_auth.activation", [])
+        signer.signers = [
+            tokens.CachedTimestampSigner(
+                salt="graphql_auth.activation", algorithm="sha1"
+            )
+        ]
+        with mock.patch("graphql_auth.tokens.get_signer", return_value=signer):
+            return get_token(self.user, TokenAction.ACTIVATION)
+
+    # the default from Django 3.1, set here for the older versions
+    @mock.patch("graphql_auth.tokens.CachedTimestampSigner.algorithm", "sha256")
+    def test_sha1_tokens_accepted(self):
+        # sent before upgrading to a Django that signs with sha256
+        token = self.get_sha1_token()
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"username": "foo"}
+        )
+        new_token = get_token(self.user, TokenAction.ACTIVATION)
+        self.assertNotEqual(new_token.split(":")[-1], token.split(":")[-1])
+
+    @mock.patch("graphql_auth.tokens.CachedTimestampSigner.algorithm", "sha256")
+    @mock.patch("graphql_auth.utils.app_settings.TOKEN_FORMAT", "compact")
+    def test_sha1_compact_tokens_accepted(self):
+        token = self.get_sha1_token()
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"pk": self.user.pk}
+        )
+        self.assertNotEqual(get_token(self.user, TokenAction.ACTIVATION), token)
+
+    def test_signer_is_reused(self):
+        self.assertIs(
+            tokens.get_signer(TokenAction.ACTIVATION),
+            tokens.get_signer(TokenAction.ACTIVATION),
+        )
+        self.assertIsNot(
+            tokens.get_signer(TokenAction.ACTIVATION),
+            tokens.get_signer(TokenAction.PASSWORD_RESET),
+        )
+
+    def test_per_action_salt(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        with self.assertRaises(BadSignature):
+            get_token_payload(token, TokenAction.ACTIVATION)
+
+    def test_legacy_tokens_accepted(self):
+        token = signing.dumps({"username": "foo", "action": TokenAction.ACTIVATION})
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"username": "foo"}
+        )
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 61):
+            with self.assertRaises(SignatureExpired):
+                get_token_payload(token, TokenAction.ACTIVATION, timedelta(seconds=60))
+
+    def test_key_rotation(self):
+        old_key = settings.SECRET_KEY
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        with self.settings(SECRET_KEY="new-key"):
+            with self.assertRaises(BadSignature):
+                get_token_payload(token, TokenAction.ACTIVATION)
+        with self.settings(SECRET_KEY="new-key"), mock.patch(
+            "graphql_auth.tokens.app_settings.TOKEN_FALLBACK_KEYS", [old_key]
+        ):
+            tokens.clear_signers()
+            self.assertEqual(
+                get_token_payload(token, TokenAction.ACTIVATION), {"username": "foo"}
+            )
+            new_token = get_token(self.user, TokenAction.ACTIVATION)
+        self.assertNotEqual(new_token.split(":")[-1], token.split(":")[-1])
+
+    @mock.patch("graphql_auth.utils.app_settings.TOKEN_FORMAT", "compact")
+    def test_compact_key_rotation(self):
+        old_key = settings.SECRET_KEY
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        with self.settings(SECRET_KEY="new-key"):
+            with self.assertRaises(BadSignature):
+                get_token_payload(token, TokenAction.ACTIVATION)
+            with mock.patch(
+                "graphql_auth.tokens.app_settings.TOKEN_FALLBACK_KEYS", [old_key]
+            ):
+                tokens.clear_signers()
+                self.assertEqual(
+                    get_token_payload(token, TokenAction.ACTIVATION),
+                    {"pk": self.user.pk},
+                )
+
+
+class GetTokensTestCase(DefaultTestCase):
+    def setUp(self):
+        self.users = [
+            self.register_user(email="%s@email.com" % name, username=name)
+            for name in ("foo", "bar")
+        ]
+
+    def test_queryset(self):
+        users = get_user_model().objects.order_by("pk")
+        with self.assertNumQueries(1):
+            result = list(get_tokens(users, TokenAction.PASSWORD_SET))
+        self.assertEqual([pk for pk, _ in result], [u.pk for u in self.users])
+        for (pk, token), user in zip(result, self.users):
+            self.assertEqual(
+                get_token_payload(token, TokenAction.PASSWORD_SET),
+                {"username": user.username},
+            )
+
+    def test_lazy(self):
+        tokens_ = get_tokens(iter([(1, "foo")]), TokenAction.ACTIVATION)
+        self.assertEqual(next(tokens_)[0], 1)
+        with self.assertRaises(StopIteration):
+            next(tokens_)
+
+    def test_same_as_get_token(self):
+        user = self.users[0]
+        [(pk, token)] = get_tokens(
+            [(user.pk, user.username)],
+            TokenAction.ACTIVATION_SECONDARY_EMAIL,
+            secondary_email="new@email.com",
+        )
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION_SECONDARY_EMAIL),
+            get_token_payload(
+                get_token(
+                    user,
+                    TokenAction.ACTIVATION_SECONDARY_EMAIL,
+                    secondary_email="new@email.com",
+                ),
+                TokenAction.ACTIVATION_SECONDARY_EMAIL,
+            ),
+        )
+
+    @mock.patch("graphql_auth.utils.app_settings.TOKEN_FORMAT", "compact")
+    def test_compact(self):
+        [(pk, token)] = get_tokens([(7, "foo")], TokenAction.ACTIVATION)
+        self.assertTrue(tokens.is_compact(token))
+        self.assertEqual(get_token_payload(token, TokenAction.ACTIVATION), {"pk": 7})
+
+
+@mock.patch("graphql_auth.utils.app_settings.TOKEN_PAYLOAD_PK", True)
+class PkPayloadTestCase(DefaultTestCase):
+    def setUp(self):
+        self.user = self.register_user(email="foo@email.com", username="foo")
+
+    def test_payload(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"pk": self.user.pk}
+        )
+        [(pk, token)] = get_tokens([(self.user.pk, "foo")], TokenAction.ACTIVATION)
+        self.assertEqual(
+            get_token_payload(token, TokenAction.ACTIVATION), {"pk": self.user.pk}
+        )
+
+    def test_valid_after_username_change(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        self.user.username = "bar"
+        self.user.save()
+        UserStatus.verify(token)
+        self.user.status.refresh_from_db()
+        self.assertTrue(self.user.status.verified)
+
+    def test_verify_loads_user_and_status_together(self):
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        with CaptureQueriesContext(connection) as queries:
+            UserStatus.verify(token)
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+        self.assertIn("graphql_auth_userstatus", selects[0]["sql"])
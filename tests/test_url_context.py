@@ -0,0 +1,63 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.requests import RequestSite
+from django.test import RequestFactory, TestCase
+
+from graphql_auth.utils import clear_url_contexts, get_url_context
+
+
+class UrlContextTestCase(TestCase):
+    def setUp(self):
+        clear_url_contexts()
+        self.addCleanup(clear_url_contexts)
+
+    def test_request_context(self):
+        request = RequestFactory().get("/", HTTP_HOST="testserver")
+        self.assertEqual(
+            get_url_context(request),
+            {
+                "site_name": "testserver",
+                "domain": "testserver",
+                "protocol": "http",
+                "port": "80",
+            },
+        )
+
+    def test_cached_per_host(self):
+        factory = RequestFactory()
+        with mock.patch(
+            "graphql_auth.utils.get_current_site", wraps=RequestSite
+        ) as get_current_site:
+            get_url_context(factory.get("/", HTTP_HOST="testserver"))
+            get_url_context(factory.get("/", HTTP_HOST="testserver"))
+            self.assertEqual(get_current_site.call_count, 1)
+            context = get_url_context(factory.get("/", secure=True))
+            self.assertEqual(get_current_site.call_count, 2)
+            self.assertEqual(context["protocol"], "https")
+            clear_url_contexts()
+            get_url_context(factory.get("/", HTTP_HOST="testserver"))
+            self.assertEqual(get_current_site.call_count, 3)
+
+    @mock.patch(
+        "graphql_auth.utils.app_settings.EMAIL_BASE_URL", "https://example.com:8443"
+    )
+    def test_base_url(self):
+        self.assertEqual(
+            get_url_context(),
+            {
+                "site_name": "example.com:8443",
+                "domain": "example.com:8443",
+                "protocol": "https",
+                "port": "8443",
+            },
+        )
+
+    @mock.patch("graphql_auth.utils.app_settings.EMAIL_BASE_URL", "https://example.com")
+    def test_email_context_without_request(self):
+        user = get_user_model().objects.create(username="foo", email="foo@email.com")
+        context = user.status.get_email_context(None, "activate", "activation")
+        self.assertEqual(context["domain"], "example.com")
+        self.assertEqual(context["port"], "443")
+        self.assertIsNone(context["request"])
+        self.assertTrue(context["token"])
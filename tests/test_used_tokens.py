@@ -0,0 +1,110 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from .testCases import DefaultTestCase
+from graphql_auth.constants import Messages, TokenAction
+from graphql_auth.exceptions import TokenAlreadyUsed
+from graphql_auth.models import UsedToken, UserStatus
+from graphql_auth.utils import get_token, get_token_digest
+
+
+@mock.patch("graphql_auth.models.app_settings.SINGLE_USE_TOKENS", True)
+class UsedTokenTestCase(DefaultTestCase):
+    def setUp(self):
+        self.user = self.register_user(
+            email="foo@email.com", username="foo", verified=True
+        )
+
+    def password_reset_query(self, token, password="new_password"):
+        return """
+        mutation {
+            passwordReset(
+                token: "%s",
+                newPassword1: "%s",
+                newPassword2: "%s"
+            )
+            { success, errors }
+        }
+        """ % (
+            token,
+            password,
+            password,
+        )
+
+    def test_consume(self):
+        UsedToken.consume("token", timedelta(hours=1))
+        with self.assertRaises(TokenAlreadyUsed):
+            UsedToken.consume("token", timedelta(hours=1))
+        self.assertEqual(UsedToken.objects.get().digest, get_token_digest("token"))
+
+    def test_disabled(self):
+        with mock.patch("graphql_auth.models.app_settings.SINGLE_USE_TOKENS", False):
+            UsedToken.consume("token", timedelta(hours=1))
+            UsedToken.consume("token", timedelta(hours=1))
+        self.assertFalse(UsedToken.objects.exists())
+
+    def test_password_reset_replay(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        executed = self.make_request(self.password_reset_query(token))
+        self.assertEqual(executed["success"], True)
+        executed = self.make_request(self.password_reset_query(token, "other_pass"))
+        self.assertEqual(executed["success"], False)
+        self.assertEqual(executed["errors"]["nonFieldErrors"], Messages.INVALID_TOKEN)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new_password"))
+
+    def test_invalid_form_keeps_token(self):
+        token = get_token(self.user, TokenAction.PASSWORD_RESET)
+        query = """
+        mutation {
+            passwordReset(
+                token: "%s", newPassword1: "new_password", newPassword2: "other"
+            )
+            { success, errors }
+        }
+        """
+        executed = self.make_request(query % token)
+        self.assertEqual(executed["success"], False)
+        self.assertFalse(UsedToken.objects.exists())
+        executed = self.make_request(self.password_reset_query(token))
+        self.assertEqual(executed["success"], True)
+
+    def test_secondary_email_replay(self):
+        token = get_token(
+            self.user,
+            TokenAction.ACTIVATION_SECONDARY_EMAIL,
+            secondary_email="new@email.com",
+        )
+        UserStatus.verify_secondary_email(token)
+        self.user.status.remove_secondary_email()
+        with self.assertRaises(TokenAlreadyUsed):
+            UserStatus.verify_secondary_email(token)
+
+    def test_activation_replay(self):
+        UserStatus.objects.filter(user=self.user).update(verified=False)
+        token = get_token(self.user, TokenAction.ACTIVATION)
+        UserStatus.verify(token)
+        # e.g. an admin reset the flag, the old link can't verify again
+        UserStatus.objects.filter(user=self.user).update(verified=False)
+        with self.assertRaises(TokenAlreadyUsed):
+            UserStatus.verify(token)
+
+    def test_purge(self):
+        now = timezone.now()
+        UsedToken.objects.bulk_create(
+            [
+                UsedToken(digest=str(i), expires_at=now - timedelta(minutes=1))
+                for i in range(5)
+            ]
+            + [UsedToken(digest="valid", expires_at=now + timedelta(minutes=1))]
+        )
+        out = StringIO()
+        call_command("purge_used_tokens", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 5 expired tokens.", out.getvalue())
+        self.assertEqual(
+            list(UsedToken.objects.values_list("digest", flat=True)), ["valid"]
+        )
@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pytest import mark
+
+from graphql_auth.constants import TokenAction
+from graphql_auth.models import InlineUserStatus, UserStatus
+from graphql_auth.shortcuts import get_user_by_email
+from graphql_auth.tasks import EmailTask, run_email_task
+from graphql_auth.utils import get_token
+
+from .testCases import DefaultTestCase
+
+
+@mark.settings_c
+class UserStatusMixinTestCase(DefaultTestCase):
+    def setUp(self):
+        self.user = self.register_user(
+            email="foo@email.com",
+            username="foo",
+            verified=True,
+            secondary_email="secondary@email.com",
+        )
+        self.not_verified_user = self.register_user(
+            email="bar@email.com", username="bar", verified=False
+        )
+        self.archived_user = self.register_user(
+            email="gaa@email.com", username="gaa", verified=True, archived=True
+        )
+
+    def assertNoStatusQueries(self, queries):
+        for query in queries:
+            self.assertNotIn("graphql_auth_userstatus", query["sql"])
+
+    def test_status_on_user_row(self):
+        self.assertFalse(UserStatus.objects.exists())
+        self.assertIsInstance(self.user.status, InlineUserStatus)
+        self.assertTrue(self.user.verified)
+        self.assertEqual(self.user.status.secondary_email, "secondary@email.com")
+        self.assertTrue(
+            get_user_model().objects.filter(pk=self.archived_user.pk, archived=True)
+        )
+
+    def test_verify_account(self):
+        token = get_token(self.not_verified_user, TokenAction.ACTIVATION)
+        query = 'mutation { verifyAccount(token: "%s") { success, errors } }'
+        with CaptureQueriesContext(connection) as queries:
+            executed = self.make_request(query % token)
+        self.assertEqual(executed["success"], True)
+        self.assertNoStatusQueries(queries)
+        self.not_verified_user.refresh_from_db()
+        self.assertTrue(self.not_verified_user.verified)
+
+    def test_login_unarchives(self):
+        query = """
+        mutation {
+            tokenAuth(username: "gaa", password: "%s")
+                { success, errors, unarchiving }
+        }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            executed = self.make_request(query % self.default_password)
+        self.assertEqual(executed["success"], True)
+        self.assertEqual(executed["unarchiving"], True)
+        self.assertNoStatusQueries(queries)
+        self.archived_user.refresh_from_db()
+        self.assertFalse(self.archived_user.archived)
+
+    def test_swap_emails(self):
+        query = 'mutation { swapEmails(password: "%s") { success, errors } }'
+        with CaptureQueriesContext(connection) as queries:
+            executed = self.make_request(
+                query % self.default_password, {"user": self.user}
+            )
+        self.assertEqual(executed["success"], True)
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "secondary@email.com")
+        self.assertEqual(self.user.secondary_email, "foo@email.com")
+
+    def test_secondary_email_lookups(self):
+        self.assertEqual(get_user_by_email("secondary@email.com"), self.user)
+        self.assertFalse(UserStatus.email_is_free("secondary@email.com"))
+        self.assertEqual(
+            UserStatus.emails_in_use(["secondary@email.com", "free@email.com"]),
+            {"secondary@email.com"},
+        )
+
+    def test_query_filter(self):
+        query = """
+        query {
+            users(archived: false, verified: true) {
+                edges { node { username, verified, archived } }
+            }
+        }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            executed = self.make_request(query)
+        self.assertEqual(
+            [edge["node"]["username"] for edge in executed["edges"]], ["foo"]
+        )
+        self.assertNoStatusQueries(queries)
+
+    def test_run_email_task(self):
+        task = EmailTask(
+            user_pk=self.user.pk,
+            action=TokenAction.ACTIVATION,
+            path="activate",
+            subject="email/activation_subject.txt",
+            template="email/activation_email.html",
+            text_template=None,
+            recipient_list=None,
+            url_context={
+                "site_name": "test",
+                "domain": "test",
+                "protocol": "http",
+                "port": "",
+            },
+            token_kwargs={},
+        )
+        with CaptureQueriesContext(connection) as queries:
+            run_email_task(task)
+        self.assertNoStatusQueries(queries)